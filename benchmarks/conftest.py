@@ -0,0 +1,84 @@
+"""Бенчмарки (не входят в обычный прогон ``pytest``).
+
+Запуск::
+
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare
+
+Фикстура ``benchmark``, сохранение (``--benchmark-json``,
+``--benchmark-autosave``) и сравнение прогонов — из pytest-benchmark.
+
+Размер общего набора данных (``bench_dataset``) задаётся переменными
+окружения ``BENCH_USERS`` и ``BENCH_HABITS``.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _TelegramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят разными write: без этого Nagle + delayed ACK
+    # добавляют ~40 мс к каждому keep-alive запросу.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.server.lock:
+            self.server.requests += 1
+        body = b'{"ok":true,"result":{}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def telegram_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TelegramStubHandler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def telegram_stub(telegram_stub_server, settings, monkeypatch):
+    """Bot API указывает на локальную заглушку, отвечающую ``ok`` на всё."""
+    from telegram_bot import bot_handler, services
+
+    host, port = telegram_stub_server.server_address
+    settings.TELEGRAM_API_URL = f"http://{host}:{port}"
+    settings.TELEGRAM_BOT_TOKEN = "bench-token"
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "bench-token")
+    # Клиенты и обработчик кешируются на процесс: берём новые под заглушку.
+    monkeypatch.setattr(services, "_clients", {})
+    monkeypatch.setattr(bot_handler, "_handlers", {})
+    telegram_stub_server.requests = 0
+    return telegram_stub_server
+
+
+@pytest.fixture(scope="session")
+def bench_dataset(django_db_setup, django_db_blocker):
+    """Общие для сессии пользователи и привычки (см. ``habits.seeding``)."""
+    from habits import seeding
+
+    users = int(os.getenv("BENCH_USERS", "500"))
+    habits = int(os.getenv("BENCH_HABITS", "5000"))
+    with django_db_blocker.unblock():
+        seeding.seed(users, habits, prefix="bench", rng=random.Random(0))
+    return {"users": users, "habits": habits}
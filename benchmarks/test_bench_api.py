@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import datetime as dt
+import itertools
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from habits.models import Habit
+
+User = get_user_model()
+
+HABIT = {
+    "place": "дома",
+    "time": "08:30:00",
+    "action": "сделать зарядку",
+    "periodicity": 1,
+    "duration_seconds": 60,
+}
+DEEP_PAGE = 20
+# Раундов для pedantic-замеров с подготовкой (у плагина по умолчанию 1).
+ROUNDS = 5
+_update_ids = itertools.count(1)
+
+
+@pytest.fixture
+def client(bench_dataset):
+    # Пользователь с наибольшим числом привычек — самый тяжёлый список.
+    user = (
+        User.objects.annotate(total=Count("habits")).order_by("-total", "pk").first()
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    client.user = user
+    return client
+
+
+# --- публичная лента ---
+
+
+@pytest.mark.django_db
+def test_public_feed_first_page_cold(benchmark, client):
+    response = benchmark.pedantic(
+        client.get, args=("/api/habits/public/",), setup=cache.clear, rounds=ROUNDS
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_public_feed_first_page_warm(benchmark, client):
+    assert client.get("/api/habits/public/").status_code == 200
+    response = benchmark(client.get, "/api/habits/public/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_public_feed_deep_page(benchmark, client):
+    url = "/api/habits/public/"
+    for _ in range(DEEP_PAGE):
+        url = client.get(url).data["next"] or url
+    response = benchmark.pedantic(
+        client.get, args=(url,), setup=cache.clear, rounds=ROUNDS
+    )
+    assert response.status_code == 200
+    benchmark.extra_info["page"] = DEEP_PAGE
+
+
+@pytest.mark.django_db
+def test_public_feed_not_modified(benchmark, client):
+    etag = client.get("/api/habits/public/")["ETag"]
+    response = benchmark(client.get, "/api/habits/public/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+# --- HabitViewSet CRUD ---
+
+
+def _habit(user) -> Habit:
+    return Habit.objects.create(user=user, **{**HABIT, "time": dt.time(8, 30)})
+
+
+@pytest.mark.django_db
+def test_habits_list(benchmark, client):
+    response = benchmark(client.get, "/api/habits/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_habits_create(benchmark, client):
+    response = benchmark(client.post, "/api/habits/", HABIT, format="json")
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_habits_retrieve(benchmark, client):
+    habit = _habit(client.user)
+    response = benchmark(client.get, f"/api/habits/{habit.pk}/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_habits_partial_update(benchmark, client):
+    habit = _habit(client.user)
+    response = benchmark(
+        client.patch,
+        f"/api/habits/{habit.pk}/",
+        {"time": "21:15:00", "is_public": True},
+        format="json",
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_habits_destroy(benchmark, client):
+    def _setup():
+        return (f"/api/habits/{_habit(client.user).pk}/",), {}
+
+    response = benchmark.pedantic(client.delete, setup=_setup, rounds=ROUNDS)
+    assert response.status_code == 204
+
+
+# --- webhook бота ---
+
+
+def _update(chat_id: int, text: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "chat": {"id": chat_id},
+            "from": {"username": "bench"},
+            "text": text,
+        },
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("text", ["/help", "/my_habits"])
+def test_webhook_dispatch(benchmark, bench_dataset, telegram_stub, text):
+    # /help отвечается прямо в теле ответа webhook'а, /my_habits уходит в
+    # очередь (в тестах celery выполняет задачу сразу, с ответом в заглушку).
+    chat_id = (
+        User.objects.filter(telegram_chat_id__isnull=False, habits__isnull=False)
+        .values_list("telegram_chat_id", flat=True)
+        .first()
+    )
+    client = APIClient()
+
+    def _setup():
+        return ("/api/telegram/webhook/", _update(chat_id, text)), {
+            "format": "json"
+        }
+
+    response = benchmark.pedantic(client.post, setup=_setup, rounds=20)
+    assert response.status_code == 200
+    benchmark.extra_info["bot_api_calls"] = telegram_stub.requests
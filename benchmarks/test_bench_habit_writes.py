@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+
+WRITES = 200
+
+
+class LegacyHabitSerializer(HabitSerializer):
+    # Прежняя реализация: full_clean в validate и ещё раз в create.
+    related_habit = serializers.PrimaryKeyRelatedField(
+        queryset=Habit.objects.all(), allow_null=True, required=False
+    )
+
+    def validate(self, attrs):
+        habit = Habit(user=self.context["request"].user, **attrs)
+        try:
+            habit.full_clean()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict) from exc
+        return attrs
+
+    def create(self, validated_data):
+        habit = Habit(user=self.context["request"].user, **validated_data)
+        habit.full_clean()
+        habit.save()
+        return habit
+
+
+@pytest.fixture
+def write_context(db):
+    user = get_user_model().objects.create_user(username="bench-writer")
+    pleasant = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(10, 0),
+        action="bath",
+        is_pleasant=True,
+        periodicity=1,
+        duration_seconds=60,
+    )
+    request = APIRequestFactory().post("/api/habits/")
+    request.user = user
+    payload = {
+        "place": "home",
+        "time": "11:00:00",
+        "action": "useful",
+        "related_habit": pleasant.pk,
+        "periodicity": 1,
+        "duration_seconds": 60,
+    }
+    return {"request": request}, payload
+
+
+def _write(serializer_class, context, payload):
+    for _ in range(WRITES):
+        serializer = serializer_class(data=payload, context=context)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+
+def _queries_per_write(serializer_class, context, payload) -> int:
+    with CaptureQueriesContext(connection) as ctx:
+        _write(serializer_class, context, payload)
+    return round(len(ctx.captured_queries) / WRITES)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "serializer_class",
+    [LegacyHabitSerializer, HabitSerializer],
+    ids=["legacy", "single_pass"],
+)
+def test_habit_create(benchmark, write_context, serializer_class):
+    context, payload = write_context
+    benchmark(_write, serializer_class, context, payload)
+    benchmark.extra_info["writes_per_sec"] = round(
+        WRITES / benchmark.stats["mean"], 1
+    )
+    benchmark.extra_info["queries_per_write"] = _queries_per_write(
+        serializer_class, context, payload
+    )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+from django.utils import timezone
+
+from habits.models import Habit
+from telegram_bot import messages
+
+HABITS_COUNT = 10_000
+
+
+def _legacy_build_text(habit: Habit) -> str:
+    # Прежняя реализация из telegram_bot/tasks.py — для сравнения.
+    reward = habit.reward
+    if habit.related_habit:
+        reward = f"Приятная привычка: {habit.related_habit.action}"
+    if reward:
+        reward = f"\nНаграда: {reward}"
+    return (
+        f"Напоминание о привычке:\n"
+        f"Действие: {habit.action}\n"
+        f"Место: {habit.place}\n"
+        f"Время: {habit.time.strftime('%H:%M')}{reward}"
+    )
+
+
+@pytest.fixture(scope="module")
+def habits() -> list[Habit]:
+    updated_at = timezone.now()
+    return [
+        Habit(
+            pk=i,
+            user_id=1,
+            place="home",
+            time=dt.time(i % 24, i % 60),
+            action=f"habit {i}",
+            reward="tea" if i % 2 else "",
+            periodicity=1,
+            duration_seconds=60,
+            updated_at=updated_at,
+        )
+        for i in range(1, HABITS_COUNT + 1)
+    ]
+
+
+def _render_all(render, habits):
+    for habit in habits:
+        render(habit)
+
+
+def test_reminder_render_legacy(benchmark, habits):
+    benchmark(_render_all, _legacy_build_text, habits)
+    benchmark.extra_info["us_per_message"] = round(
+        benchmark.stats["mean"] / HABITS_COUNT * 1e6, 3
+    )
+
+
+def test_reminder_render(benchmark, habits):
+    # Без кеша: в рассылке каждая привычка рисуется раз за период.
+    benchmark(_render_all, messages.render_reminder, habits)
+    benchmark.extra_info["us_per_message"] = round(
+        benchmark.stats["mean"] / HABITS_COUNT * 1e6, 3
+    )
+
+
+def test_habit_list_render(benchmark, habits):
+    messages.clear_render_cache()
+    pages = [habits[i : i + 10] for i in range(0, HABITS_COUNT, 10)]
+
+    def _render_pages():
+        for page in pages:
+            messages.render_habit_list(page)
+
+    benchmark(_render_pages)
+    benchmark.extra_info["us_per_message"] = round(
+        benchmark.stats["mean"] / len(pages) * 1e6, 3
+    )
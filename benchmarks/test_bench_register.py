@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+from telegram_bot import bot_handler
+
+BURST = 10
+_usernames = itertools.count()
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setattr(bot_handler, "send_telegram_message", lambda **kw: None)
+    return bot_handler.BotHandler(
+        "token", states=bot_handler.MemoryStateStore(ttl=60, maxsize=10)
+    )
+
+
+def _burst(register):
+    for _ in range(BURST):
+        number = next(_usernames)
+        register(10_000_000 + number, f"bench{number}", "secret123")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "hasher",
+    [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ],
+)
+def test_register_burst(benchmark, settings, handler, hasher):
+    settings.PASSWORD_HASHERS = [hasher]
+    benchmark(_burst, handler.register_user)
+    benchmark.extra_info["registrations_per_sec"] = round(
+        BURST / benchmark.stats["mean"], 1
+    )
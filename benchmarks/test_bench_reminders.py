@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+
+import pytest
+from django.utils import timezone
+
+from habits.models import Habit
+from telegram_bot import tasks
+
+# Сколько привычек «созрело» к тику рассылки.
+DUE = int(os.getenv("BENCH_DUE", "1000"))
+
+
+@pytest.mark.django_db
+def test_send_habits_reminders(benchmark, bench_dataset, telegram_stub):
+    due_ids = list(Habit.objects.order_by("pk").values_list("pk", flat=True)[:DUE])
+
+    def _make_due():
+        Habit.objects.filter(pk__in=due_ids).update(
+            next_reminder_at=timezone.now() - dt.timedelta(minutes=1)
+        )
+
+    dispatched = benchmark.pedantic(
+        tasks.send_habits_reminders, setup=_make_due, rounds=3
+    )
+
+    assert dispatched == len(due_ids)
+    benchmark.extra_info["due"] = len(due_ids)
+    benchmark.extra_info["messages_sent"] = telegram_stub.requests // 3
+    benchmark.extra_info["habits_per_sec"] = round(
+        len(due_ids) / benchmark.stats["mean"], 1
+    )
@@ -4,6 +4,7 @@ import os
 import sys
 from pathlib import Path
 
+from django.conf import global_settings
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -147,6 +148,14 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.User"
 
+# Хешеры паролей: пути импорта через запятую, первый хеширует новые пароли,
+# остальные только проверяют старые. По умолчанию — набор Django (PBKDF2).
+PASSWORD_HASHERS = [
+    hasher.strip()
+    for hasher in os.getenv("PASSWORD_HASHERS", "").split(",")
+    if hasher.strip()
+] or global_settings.PASSWORD_HASHERS
+
 CORS_ALLOWED_ORIGINS = [
     origin.strip()
     for origin in os.getenv("CORS_ALLOWED_ORIGINS", "").split(",")
@@ -163,6 +172,21 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 5,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+# Предел размера страницы привычек, который может запросить клиент.
+HABITS_MAX_PAGE_SIZE = int(os.getenv("HABITS_MAX_PAGE_SIZE", "100"))
+# Сколько привычек можно передать в одном запросе к /api/habits/bulk/.
+HABITS_BULK_MAX_BATCH_SIZE = int(os.getenv("HABITS_BULK_MAX_BATCH_SIZE", "500"))
+# Дельта-синхронизация /api/habits/changes/: на сколько секунд новый
+# watermark отстаёт от текущего времени (чтобы не потерять ещё не
+# закоммиченные записи) и сколько дней хранятся отметки об удалении.
+HABITS_SYNC_OVERLAP_SECONDS = int(os.getenv("HABITS_SYNC_OVERLAP_SECONDS", "10"))
+HABITS_TOMBSTONE_RETENTION_DAYS = int(
+    os.getenv("HABITS_TOMBSTONE_RETENTION_DAYS", "30")
+)
+# Публичная лента: сколько секунд клиенты и nginx могут не перепроверять
+# страницу (Cache-Control max-age) и сколько она живёт в кеше Django.
+HABITS_PUBLIC_CACHE_MAX_AGE = int(os.getenv("HABITS_PUBLIC_CACHE_MAX_AGE", "30"))
+HABITS_PUBLIC_CACHE_TIMEOUT = int(os.getenv("HABITS_PUBLIC_CACHE_TIMEOUT", "300"))
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Atomic Habits Tracker API",
@@ -170,15 +194,114 @@ SPECTACULAR_SETTINGS = {
 }
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+# Redis для общего состояния бота (лимитер и т.п.); пустая строка — хранить
+# всё в памяти процесса.
+REDIS_URL = os.getenv("REDIS_URL", CELERY_BROKER_URL)
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    )
+}
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULE = {
     "send-habits-reminders-every-minute": {
         "task": "telegram_bot.tasks.send_habits_reminders",
         "schedule": 60.0,
-    }
+    },
+    "prune-habit-tombstones-daily": {
+        "task": "habits.tasks.prune_habit_tombstones",
+        "schedule": 24 * 60 * 60.0,
+    },
 }
 
-if "pytest" in sys.argv:
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+# Адрес Bot API (можно указать собственный telegram-bot-api сервер).
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+# Middleware бота (пути импорта), см. telegram_bot.bot_handler.Middleware.
+TELEGRAM_BOT_MIDDLEWARES: list[str] = []
+
+# Сколько очередей celery делят входящие обновления бота (по chat_id).
+# Каждую очередь должен разбирать один воркер с --concurrency 1, см.
+# сервисы celery-updates-* в docker-compose.prod.yml.
+TELEGRAM_UPDATE_QUEUES = int(os.getenv("TELEGRAM_UPDATE_QUEUES", "4"))
+# Повторные доставки обновлений отбрасываются по update_id: отметка в Redis
+# живёт TTL секунд (Telegram хранит обновления до суток), без Redis — окно
+# из последних WINDOW update_id в памяти процесса.
+TELEGRAM_UPDATE_DEDUP_TTL = int(os.getenv("TELEGRAM_UPDATE_DEDUP_TTL", "86400"))
+TELEGRAM_UPDATE_DEDUP_WINDOW = int(
+    os.getenv("TELEGRAM_UPDATE_DEDUP_WINDOW", "100000")
+)
+
+# HTTP-клиент Telegram: размер пула keep-alive соединений на процесс
+# и таймаут запроса в секундах.
+TELEGRAM_HTTP_POOL_SIZE = int(os.getenv("TELEGRAM_HTTP_POOL_SIZE", "10"))
+TELEGRAM_HTTP_TIMEOUT = float(os.getenv("TELEGRAM_HTTP_TIMEOUT", "10"))
+# Сколько сообщений одна задача рассылки держит в полёте одновременно.
+# Значение больше TELEGRAM_HTTP_POOL_SIZE урезается до размера пула.
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", "8"))
+
+# Лимиты Telegram: сообщений в секунду на бота и на один чат. Счётчики
+# общие для всех воркеров (Redis), после 429 отправка ставится на паузу
+# на retry_after. Если слота ждать дольше MAX_WAIT секунд, сообщение
+# уходит на повтор позже, а не держит поток.
+TELEGRAM_RATE_LIMIT_ENABLED = os.getenv(
+    "TELEGRAM_RATE_LIMIT_ENABLED", "true"
+).lower() in {"1", "true", "yes", "on"}
+TELEGRAM_RATE_LIMIT_GLOBAL = float(os.getenv("TELEGRAM_RATE_LIMIT_GLOBAL", "30"))
+TELEGRAM_RATE_LIMIT_PER_CHAT = float(os.getenv("TELEGRAM_RATE_LIMIT_PER_CHAT", "1"))
+TELEGRAM_RATE_LIMIT_MAX_WAIT = float(os.getenv("TELEGRAM_RATE_LIMIT_MAX_WAIT", "5"))
+
+# Состояние пошаговых диалогов бота: TTL в секундах (брошенный диалог
+# забывается) и предел числа диалогов в памяти, если Redis не настроен.
+TELEGRAM_STATE_TTL = int(os.getenv("TELEGRAM_STATE_TTL", "3600"))
+TELEGRAM_STATE_MEMORY_SIZE = int(os.getenv("TELEGRAM_STATE_MEMORY_SIZE", "10000"))
+
+# Кеш chat_id -> user_id для команд бота: TTL в Redis и в памяти процесса
+# (секунды; локальный не сбрасывается из других процессов, поэтому короткий)
+# и предел числа чатов в памяти.
+TELEGRAM_CHAT_USER_CACHE_TTL = int(os.getenv("TELEGRAM_CHAT_USER_CACHE_TTL", "600"))
+TELEGRAM_CHAT_USER_LOCAL_TTL = float(os.getenv("TELEGRAM_CHAT_USER_LOCAL_TTL", "10"))
+TELEGRAM_CHAT_USER_CACHE_SIZE = int(
+    os.getenv("TELEGRAM_CHAT_USER_CACHE_SIZE", "10000")
+)
+
+# Сколько отрисованных текстов привычек держать в LRU-кеше на процесс.
+TELEGRAM_RENDER_CACHE_SIZE = int(os.getenv("TELEGRAM_RENDER_CACHE_SIZE", "10000"))
+
+# Рассылка напоминаний режется на шарды по диапазонам ID, каждый шард —
+# отдельная задача, которую может взять любой воркер.
+TELEGRAM_REMINDER_SHARD_SIZE = int(os.getenv("TELEGRAM_REMINDER_SHARD_SIZE", "200"))
+# На сколько секунд диспетчер «захватывает» привычку; если шард не смог
+# отправить напоминание, оно уйдёт повторно после истечения аренды.
+TELEGRAM_REMINDER_LEASE_SECONDS = int(
+    os.getenv("TELEGRAM_REMINDER_LEASE_SECONDS", "300")
+)
+# Повторы неудавшихся напоминаний: экспоненциальная задержка (сек) с jitter,
+# после MAX_ATTEMPTS повторов напоминание уходит в ReminderDeadLetter.
+TELEGRAM_REMINDER_RETRY_MAX_ATTEMPTS = int(
+    os.getenv("TELEGRAM_REMINDER_RETRY_MAX_ATTEMPTS", "5")
+)
+TELEGRAM_REMINDER_RETRY_BASE_DELAY = float(
+    os.getenv("TELEGRAM_REMINDER_RETRY_BASE_DELAY", "2")
+)
+TELEGRAM_REMINDER_RETRY_MAX_DELAY = float(
+    os.getenv("TELEGRAM_REMINDER_RETRY_MAX_DELAY", "60")
+)
+# Сколько строк обновлять одним UPDATE после рассылки напоминаний.
+TELEGRAM_REMINDER_UPDATE_BATCH_SIZE = int(
+    os.getenv("TELEGRAM_REMINDER_UPDATE_BATCH_SIZE", "500")
+)
+
+if "pytest" in sys.modules:
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
+    REDIS_URL = ""
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    TELEGRAM_RATE_LIMIT_ENABLED = False
+    PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -0,0 +1,191 @@
+"""Пакетные операции с привычками для ``/api/habits/bulk/``.
+
+Пачка проверяется целиком до записи: связанные привычки всех элементов
+выбираются одним запросом, каждый элемент проходит обычный
+``HabitSerializer``. Корректные элементы пишутся одним ``bulk_create`` /
+``bulk_update`` в одной транзакции, по ошибочным возвращается причина.
+``bulk_*`` не вызывают ``save()`` и сигналы, поэтому расписание,
+``updated_at`` и версия публичной ленты обновляются здесь вручную.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .feed import bump_public_feed_version
+from .models import Habit
+from .serializers import HabitSerializer
+
+# Поля, которые bulk_update пишет всегда (вычисляются, а не приходят).
+COMPUTED_FIELDS = ("next_reminder_at", "updated_at")
+INVALID_ID = {"id": ["Ожидается целочисленный ID."]}
+
+
+def _is_id(value) -> bool:
+    # bool — подкласс int, но True/False как ID не принимаем.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _invalid_id(pk) -> dict:
+    return {"id": pk, "status": status.HTTP_400_BAD_REQUEST, "errors": INVALID_ID}
+
+
+def _related_habits(values: Iterable) -> dict[int, Habit]:
+    # pk приводятся так же, как в RelatedHabitField (int()), чтобы "5"
+    # принимался и здесь, и в обычном POST /api/habits/.
+    pks = set()
+    for value in values:
+        if value is None:
+            continue
+        try:
+            pks.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    if not pks:
+        return {}
+    return Habit.objects.only("id", "user", "is_pleasant").in_bulk(pks)
+
+
+def _context(request, related_habits: dict[int, Habit]) -> dict:
+    return {"request": request, "related_habits": related_habits}
+
+
+def _bump_public_feed(habits: Iterable[Habit]) -> None:
+    if any(habit.public_feed_changed() for habit in habits):
+        transaction.on_commit(bump_public_feed_version)
+
+
+def bulk_create(request, items: list[dict]) -> list[dict]:
+    context = _context(
+        request, _related_habits(item.get("related_habit") for item in items)
+    )
+    results: list[dict] = []
+    habits: list[Habit] = []
+    for item in items:
+        serializer = HabitSerializer(data=item, context=context)
+        if not serializer.is_valid():
+            results.append(
+                {"status": status.HTTP_400_BAD_REQUEST, "errors": serializer.errors}
+            )
+            continue
+        habit = serializer.validated_habit
+        habit.refresh_next_reminder()
+        habits.append(habit)
+        results.append({"status": status.HTTP_201_CREATED, "habit": habit})
+
+    if habits:
+        with transaction.atomic():
+            _bump_public_feed(habits)
+            Habit.objects.bulk_create(habits)
+        for habit in habits:
+            habit.mark_saved()
+    return _render(results, context)
+
+
+def bulk_update(request, items: list[dict]) -> list[dict]:
+    ids = [item.get("id") for item in items]
+    instances = Habit.objects.filter(user=request.user).in_bulk(
+        [pk for pk in ids if _is_id(pk)]
+    )
+    context = _context(
+        request,
+        _related_habits(
+            [item.get("related_habit") for item in items]
+            + [habit.related_habit_id for habit in instances.values()]
+        ),
+    )
+    # Текущие связанные привычки тоже из общей выборки: Habit.clean
+    # обращается к ним, а подгрузка по одной — лишний запрос на элемент.
+    for habit in instances.values():
+        if habit.related_habit_id in context["related_habits"]:
+            habit.related_habit = context["related_habits"][habit.related_habit_id]
+
+    results: list[dict] = []
+    habits: list[Habit] = []
+    fields: set[str] = set()
+    seen: set[int] = set()
+    now = timezone.now()
+    for pk, item in zip(ids, items):
+        if not _is_id(pk):
+            results.append(_invalid_id(pk))
+            continue
+        instance = instances.get(pk)
+        if instance is None:
+            results.append({"id": pk, "status": status.HTTP_404_NOT_FOUND})
+            continue
+        if pk in seen:
+            results.append(
+                {
+                    "id": pk,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": {"id": ["Привычка уже есть в этой пачке."]},
+                }
+            )
+            continue
+        seen.add(pk)
+        data = {key: value for key, value in item.items() if key != "id"}
+        serializer = HabitSerializer(
+            instance, data=data, partial=True, context=context
+        )
+        if not serializer.is_valid():
+            results.append(
+                {
+                    "id": pk,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": serializer.errors,
+                }
+            )
+            continue
+        habit = serializer.validated_habit
+        habit.refresh_next_reminder()
+        habit.updated_at = now
+        fields.update(serializer.validated_data)
+        habits.append(habit)
+        results.append({"id": pk, "status": status.HTTP_200_OK, "habit": habit})
+
+    if habits:
+        with transaction.atomic():
+            _bump_public_feed(habits)
+            Habit.objects.bulk_update(habits, [*fields, *COMPUTED_FIELDS])
+        for habit in habits:
+            habit.mark_saved()
+    return _render(results, context)
+
+
+def bulk_delete(request, ids: list) -> list[dict]:
+    with transaction.atomic():
+        found = set(
+            Habit.objects.filter(
+                user=request.user, pk__in=[pk for pk in ids if _is_id(pk)]
+            ).values_list("pk", flat=True)
+        )
+        # Через QuerySet.delete(): он шлёт post_delete, и лента сбросится
+        # сама (см. habits.signals).
+        Habit.objects.filter(pk__in=found).delete()
+    return [
+        (
+            {
+                "id": pk,
+                "status": (
+                    status.HTTP_204_NO_CONTENT
+                    if pk in found
+                    else status.HTTP_404_NOT_FOUND
+                ),
+            }
+            if _is_id(pk)
+            else _invalid_id(pk)
+        )
+        for pk in ids
+    ]
+
+
+def _render(results: list[dict], context: dict) -> list[dict]:
+    for result in results:
+        habit = result.pop("habit", None)
+        if habit is not None:
+            result["data"] = HabitSerializer(habit, context=context).data
+    return results
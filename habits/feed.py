@@ -0,0 +1,43 @@
+"""Кеш публичной ленты привычек.
+
+Лента одинакова для всех, поэтому ответ каждой страницы кешируется целиком.
+Ключи содержат версию ленты; любое изменение публичной привычки (см.
+``habits.signals``) записывает новую версию, и старые страницы просто
+перестают читаться и истекают по TTL. Та же версия входит в ETag, так что
+повторный запрос с ``If-None-Match`` получает 304 без обращения к БД.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = "habits:public:version"
+
+
+def public_feed_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Версия — время в нс: после вытеснения ключа из кеша новая версия
+        # не совпадёт ни с одной из прежних.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_public_feed_version() -> None:
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def page_digest(uri: str) -> str:
+    return hashlib.md5(uri.encode(), usedforsecurity=False).hexdigest()
+
+
+def page_cache_key(version: int, digest: str) -> str:
+    return f"habits:public:{version}:{digest}"
+
+
+def page_etag(version: int, digest: str) -> str:
+    return f'"{version}-{digest}"'
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from habits import seeding
+from habits.models import Habit
+from habits.pagination import HabitCursorPagination, keyset_filter
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN горячих запросов к привычкам: проверить, что планировщик "
+        "использует индексы из Habit.Meta.indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-users",
+            type=int,
+            default=0,
+            help="Сначала создать столько синтетических пользователей",
+        )
+        parser.add_argument(
+            "--seed-habits",
+            type=int,
+            default=0,
+            help="Сначала создать столько синтетических привычек (например, 1000000)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Завершиться с ошибкой, если какой-то запрос идёт мимо индекса",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed_habits"]:
+            users, habits = seeding.seed(
+                max(options["seed_users"], 1), options["seed_habits"]
+            )
+            self.stdout.write(f"Создано пользователей: {users}, привычек: {habits}")
+
+        if not Habit.objects.exists():
+            raise CommandError("Нет привычек: запустите с --seed-habits N")
+
+        # Статистика для планировщика после массовой вставки.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "ANALYZE"
+                if connection.vendor == "sqlite"
+                else f"ANALYZE {Habit._meta.db_table}"
+            )
+
+        missing = []
+        for name, index, queryset in self._query_shapes():
+            plan = queryset.explain()
+            used = index in plan
+            if not used:
+                missing.append(name)
+            style = self.style.SUCCESS if used else self.style.ERROR
+            self.stdout.write(style(f"{'OK' if used else 'НЕТ'} {name} -> {index}"))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+        if missing and options["check"]:
+            raise CommandError(f"Запросы без ожидаемого индекса: {', '.join(missing)}")
+
+    def _query_shapes(self):
+        """(название, ожидаемый индекс, queryset) для каждого горячего запроса."""
+        now = timezone.now()
+        user_id = Habit.objects.order_by("-id").values_list("user_id", flat=True)[0]
+        bounds = Habit.objects.filter(is_public=True).aggregate(
+            first=Min("created_at"), last=Max("created_at")
+        )
+        if bounds["first"] is not None:
+            middle = bounds["first"] + (bounds["last"] - bounds["first"]) / 2
+        else:
+            middle = now
+
+        return [
+            (
+                "список своих привычек (HabitViewSet)",
+                "habit_user_created_idx",
+                Habit.objects.filter(user_id=user_id).order_by("-created_at", "-id")[
+                    :6
+                ],
+            ),
+            (
+                "/my_habits в боте",
+                "habit_user_created_idx",
+                Habit.objects.select_related("related_habit", "user")
+                .filter(user_id=user_id)
+                .order_by("-created_at", "-id")[:10],
+            ),
+            (
+                "публичная лента, первая страница",
+                "habit_public_created_idx",
+                Habit.objects.filter(is_public=True).order_by("-created_at", "-id")[
+                    :6
+                ],
+            ),
+            (
+                "публичная лента, страница по курсору",
+                "habit_public_created_idx",
+                Habit.objects.filter(
+                    keyset_filter(HabitCursorPagination.ordering, (middle, 0)),
+                    is_public=True,
+                ).order_by(*HabitCursorPagination.ordering)[:6],
+            ),
+            (
+                "рассылка: привычки к отправке",
+                "habit_next_reminder_idx",
+                Habit.objects.filter(next_reminder_at__lte=now)
+                .order_by()
+                .values_list("pk", flat=True),
+            ),
+            (
+                "дельта-синхронизация",
+                "habit_user_updated_idx",
+                Habit.objects.filter(
+                    user_id=user_id, updated_at__gt=now - dt.timedelta(minutes=5)
+                ).order_by("updated_at", "id"),
+            ),
+        ]
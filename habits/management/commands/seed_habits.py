@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from habits import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Создать синтетических пользователей и привычки с реалистичным "
+        "распределением времени напоминаний (для нагрузочных замеров)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, required=True, help="Сколько создать пользователей"
+        )
+        parser.add_argument(
+            "--habits", type=int, required=True, help="Сколько создать привычек"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Размер пачки bulk_create",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Зерно генератора для воспроизводимых данных",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Префикс логинов создаваемых пользователей",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["habits"] < 0:
+            raise CommandError("--users должен быть >= 1, --habits — >= 0")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть >= 1")
+
+        started = time.perf_counter()
+        users, habits = seeding.seed(
+            options["users"],
+            options["habits"],
+            batch_size=options["batch_size"],
+            prefix=options["prefix"],
+            rng=random.Random(options["seed"]),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано пользователей: {users}, привычек: {habits} "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+        )
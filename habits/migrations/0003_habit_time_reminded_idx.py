@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                fields=["time", "last_reminded_at"], name="habit_time_reminded_idx"
+            ),
+        ),
+    ]
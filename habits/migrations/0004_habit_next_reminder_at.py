@@ -0,0 +1,73 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:40
+
+import datetime as dt
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compute_next_reminder_at(time, periodicity, last_reminded_at, now=None):
+    # Копия habits.models.compute_next_reminder_at на момент миграции:
+    # историческая миграция не должна зависеть от будущих правок модели.
+    base = timezone.localtime(now or timezone.now()).replace(
+        second=0, microsecond=0
+    )
+    if last_reminded_at is not None:
+        last_day = timezone.localtime(last_reminded_at).date()
+        window_start = timezone.make_aware(
+            dt.datetime.combine(last_day + dt.timedelta(days=periodicity), dt.time.min)
+        )
+        base = max(base, window_start)
+
+    day = base.date()
+    if time < base.time():
+        day += dt.timedelta(days=1)
+    return timezone.make_aware(dt.datetime.combine(day, time))
+
+
+def fill_next_reminder_at(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    batch = []
+    for habit in Habit.objects.only(
+        "id", "time", "periodicity", "last_reminded_at"
+    ).iterator(chunk_size=2000):
+        habit.next_reminder_at = compute_next_reminder_at(
+            habit.time, habit.periodicity, habit.last_reminded_at
+        )
+        batch.append(habit)
+        if len(batch) >= 2000:
+            Habit.objects.bulk_update(batch, ["next_reminder_at"])
+            batch = []
+    if batch:
+        Habit.objects.bulk_update(batch, ["next_reminder_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_habit_time_reminded_idx"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="habit",
+            name="habit_time_reminded_idx",
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="next_reminder_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Следующий момент отправки напоминания (UTC).",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                fields=["next_reminder_at"], name="habit_next_reminder_idx"
+            ),
+        ),
+        migrations.RunPython(fill_next_reminder_at, migrations.RunPython.noop),
+    ]
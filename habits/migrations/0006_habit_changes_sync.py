@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_habit_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.BigIntegerField()),
+                ("habit_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                fields=["user", "updated_at"], name="habit_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habittombstone",
+            index=models.Index(
+                fields=["user_id", "deleted_at"], name="habit_tombstone_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habittombstone",
+            index=models.Index(
+                fields=["deleted_at"], name="habit_tombstone_deleted_idx"
+            ),
+        ),
+    ]
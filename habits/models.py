@@ -1,14 +1,65 @@
 from __future__ import annotations
 
+import datetime as dt
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
+
+# Поля, от которых зависит расписание напоминаний.
+SCHEDULE_FIELDS = ("time", "periodicity", "last_reminded_at")
+# Поля, которые видны в публичной ленте (плюс сам флаг is_public).
+PUBLIC_FIELDS = (
+    "is_public",
+    "place",
+    "time",
+    "action",
+    "is_pleasant",
+    "related_habit_id",
+    "periodicity",
+    "reward",
+    "duration_seconds",
+)
+
+
+def compute_next_reminder_at(
+    time: dt.time,
+    periodicity: int,
+    last_reminded_at: dt.datetime | None,
+    now: dt.datetime | None = None,
+) -> dt.datetime:
+    """Ближайший момент напоминания не раньше текущей минуты.
+
+    Если напоминание уже отправлялось, следующее возможно не раньше, чем
+    через ``periodicity`` дней от даты последнего (как и прежде, по
+    локальному календарю).
+    """
+    base = timezone.localtime(now or timezone.now()).replace(
+        second=0, microsecond=0
+    )
+    if last_reminded_at is not None:
+        last_day = timezone.localtime(last_reminded_at).date()
+        window_start = timezone.make_aware(
+            dt.datetime.combine(last_day + dt.timedelta(days=periodicity), dt.time.min)
+        )
+        base = max(base, window_start)
+
+    day = base.date()
+    if time < base.time():
+        day += dt.timedelta(days=1)
+    return timezone.make_aware(dt.datetime.combine(day, time))
 
 
 class Habit(models.Model):
+    # Отдельный индекс по user не нужен: его заменяют составные индексы,
+    # которые начинаются с user (см. Meta.indexes).
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="habits"
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="habits",
+        db_index=False,
     )
     place = models.CharField(max_length=255)
     time = models.TimeField(help_text="Локальное время напоминания.")
@@ -36,12 +87,94 @@ class Habit(models.Model):
     is_public = models.BooleanField(default=False)
 
     last_reminded_at = models.DateTimeField(null=True, blank=True)
+    next_reminder_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Следующий момент отправки напоминания (UTC).",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ("-created_at",)
+        ordering = ("-created_at", "-id")
+        indexes = (
+            # Рассылка: next_reminder_at <= now, нужны только ID.
+            models.Index(
+                fields=("next_reminder_at", "id"),
+                name="habit_next_reminder_idx",
+            ),
+            # Keyset-пагинация списков: свои привычки и публичная лента.
+            models.Index(
+                fields=("user", "-created_at", "-id"),
+                name="habit_user_created_idx",
+            ),
+            models.Index(
+                fields=("-created_at", "-id"),
+                name="habit_public_created_idx",
+                condition=models.Q(is_public=True),
+            ),
+            # Дельта-синхронизация: изменения пользователя после watermark.
+            models.Index(
+                fields=("user", "updated_at"),
+                name="habit_user_updated_idx",
+            ),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._schedule_state = instance._get_schedule_state()
+        instance._public_state = instance._get_public_state()
+        return instance
+
+    def _get_schedule_state(self) -> tuple:
+        # Берём значения из __dict__, чтобы не подгружать отложенные поля.
+        return tuple(self.__dict__.get(name) for name in SCHEDULE_FIELDS)
+
+    def _get_public_state(self) -> tuple:
+        return tuple(self.__dict__.get(name) for name in PUBLIC_FIELDS)
+
+    def public_feed_changed(self) -> bool:
+        """Изменит ли сохранение публичную ленту."""
+        previous = getattr(self, "_public_state", None)
+        if previous == self._get_public_state():
+            return False
+        was_public = previous is not None and previous[0]
+        return bool(was_public or self.is_public)
+
+    def schedule_next_reminder(self, now: dt.datetime | None = None) -> None:
+        """Пересчитать ``next_reminder_at`` по текущим полям расписания."""
+        self.next_reminder_at = compute_next_reminder_at(
+            self.time, self.periodicity, self.last_reminded_at, now
+        )
+
+    def refresh_next_reminder(self) -> bool:
+        """Пересчитать ``next_reminder_at``, если поменялось расписание.
+
+        Возвращает True, если значение пересчитано.
+        """
+        schedule_changed = (
+            getattr(self, "_schedule_state", None) != self._get_schedule_state()
+        )
+        if self.next_reminder_at is None or schedule_changed:
+            self.schedule_next_reminder()
+            return True
+        return False
+
+    def mark_saved(self) -> None:
+        """Запомнить текущие значения как сохранённые (после bulk-записи)."""
+        self._schedule_state = self._get_schedule_state()
+        self._public_state = self._get_public_state()
+
+    def save(self, *args, **kwargs):
+        if self.refresh_next_reminder():
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "next_reminder_at"}
+        super().save(*args, **kwargs)
+        self.mark_saved()
 
     def clean(self):
         errors: dict[str, str] = {}
@@ -81,3 +214,28 @@ class Habit(models.Model):
 
     def __str__(self) -> str:
         return f"{self.user_id}: {self.action} @ {self.time}"
+
+
+class HabitTombstone(models.Model):
+    """Отметка об удалённой привычке для ``/api/habits/changes/``.
+
+    ``user_id`` — просто число, а не внешний ключ: отметки создаются и при
+    каскадном удалении вместе с пользователем. Старые отметки удаляет
+    ``habits.tasks.prune_habit_tombstones``.
+    """
+
+    user_id = models.BigIntegerField()
+    habit_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=("user_id", "deleted_at"),
+                name="habit_tombstone_user_idx",
+            ),
+            models.Index(fields=("deleted_at",), name="habit_tombstone_deleted_idx"),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: habit {self.habit_id} deleted @ {self.deleted_at}"
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+POSITION_SEPARATOR = "|"
+
+
+def keyset_filter(ordering: Sequence[str], values: Sequence) -> Q:
+    """Условие «строго после ``values``» для сортировки ``ordering``.
+
+    Для ``("-created_at", "-id")`` это ``(created_at, id) < (v1, v2)``,
+    записанное как ``created_at <= v1 AND (created_at < v1 OR
+    (created_at = v1 AND id < v2))``: первое слагаемое даёт планировщику
+    границу диапазона по индексу, остальное отсекает равные ``created_at``.
+    """
+    fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+    after = Q()
+    equal = Q()
+    for (field, descending), value in zip(fields, values):
+        op = "lt" if descending else "gt"
+        after |= equal & Q(**{f"{field}__{op}": value})
+        equal &= Q(**{field: value})
+    first, descending = fields[0]
+    bound = Q(**{f"{first}__{'lte' if descending else 'gte'}": values[0]})
+    return bound & after
+
+
+class HabitCursorPagination(CursorPagination):
+    """Keyset-пагинация по ``(created_at, id)`` без OFFSET и COUNT(*).
+
+    Стандартный ``CursorPagination`` ищет только по первому полю
+    сортировки, а равные ``created_at`` пропускает через OFFSET (не больше
+    ``offset_cutoff``). Здесь позиция в курсоре — пара ``created_at|id``,
+    она уникальна, и страница выбирается условием по паре целиком: любая
+    страница — один индексный диапазон, как и первая. Размер страницы
+    клиент задаёт параметром ``page_size`` (не больше
+    ``HABITS_MAX_PAGE_SIZE``).
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = settings.HABITS_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            values = current_position.split(POSITION_SEPARATOR)
+            if len(values) != len(ordering):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(keyset_filter(ordering, values))
+            except (ValueError, ValidationError) as exc:
+                raise NotFound(self.invalid_cursor_message) from exc
+
+        # Дальше — как в CursorPagination: лишний элемент показывает, есть
+        # ли следующая страница.
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for name in ordering:
+            field = name.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[field]
+            else:
+                value = getattr(instance, field)
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(str(value))
+        return POSITION_SEPARATOR.join(values)
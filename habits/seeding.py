@@ -0,0 +1,115 @@
+"""Генерация синтетических пользователей и привычек для замеров.
+
+Пишет пачками через ``bulk_create``, без ``save()`` и сигналов, поэтому
+``next_reminder_at`` считается здесь же. Пароли у пользователей
+непригодные для входа.
+
+Время напоминаний распределено как у живых пользователей: пики утром,
+в обед и вечером, почти ничего ночью, минуты чаще «круглые». Большинству
+пользователей выдаётся ``telegram_chat_id``, чтобы рассылка реально
+отправляла сообщения, а не только переносила расписание.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Habit, compute_next_reminder_at
+
+User = get_user_model()
+
+PLACES = ("дома", "в офисе", "в парке", "в спортзале", "на кухне")
+ACTIONS = ("выпить воды", "сделать зарядку", "почитать", "медитировать", "прогулка")
+
+# Относительная популярность часов 0..23 для времени напоминания.
+HOUR_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 6, 12, 14, 10, 6, 5,
+    8, 7, 4, 4, 4, 5, 8, 11, 12, 10, 7, 3,
+)  # fmt: skip
+_HOUR_CUM_WEIGHTS = tuple(accumulate(HOUR_WEIGHTS))
+# Доля «круглых» минут (:00, :15, :30, :45) и пользователей с Telegram.
+ROUND_MINUTES_SHARE = 0.7
+TELEGRAM_USERS_SHARE = 0.8
+# Синтетические chat_id начинаются отсюда, чтобы не пересечься с живыми.
+CHAT_ID_START = 10**12
+
+
+def seed(
+    users: int,
+    habits: int,
+    *,
+    batch_size: int = 5000,
+    prefix: str = "seed",
+    rng: random.Random | None = None,
+) -> tuple[int, int]:
+    """Создать ``users`` пользователей и ``habits`` привычек между ними."""
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    password = make_password(None)
+    run = now.strftime("%Y%m%d%H%M%S")
+
+    last_chat_id = User.objects.aggregate(last=Max("telegram_chat_id"))["last"]
+    next_chat_id = max(last_chat_id or 0, CHAT_ID_START - 1) + 1
+
+    user_ids: list[int] = []
+    for start in range(0, users, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, users)):
+            chat_id = None
+            if rng.random() < TELEGRAM_USERS_SHARE:
+                chat_id, next_chat_id = next_chat_id, next_chat_id + 1
+            batch.append(
+                User(
+                    username=f"{prefix}-{run}-{i}",
+                    password=password,
+                    telegram_chat_id=chat_id,
+                )
+            )
+        with transaction.atomic():
+            user_ids.extend(user.pk for user in User.objects.bulk_create(batch))
+
+    for start in range(0, habits, batch_size):
+        batch = [
+            _habit(rng, rng.choice(user_ids), now)
+            for _ in range(start, min(start + batch_size, habits))
+        ]
+        with transaction.atomic():
+            Habit.objects.bulk_create(batch)
+    return len(user_ids), habits
+
+
+def _habit(rng: random.Random, user_id: int, now: dt.datetime) -> Habit:
+    time = reminder_time(rng)
+    periodicity = rng.randint(1, 7)
+    is_pleasant = rng.random() < 0.2
+    habit = Habit(
+        user_id=user_id,
+        place=rng.choice(PLACES),
+        time=time,
+        action=rng.choice(ACTIONS),
+        is_pleasant=is_pleasant,
+        periodicity=periodicity,
+        reward="" if is_pleasant or rng.random() < 0.5 else "чай",
+        duration_seconds=rng.randint(10, 120),
+        is_public=rng.random() < 0.1,
+    )
+    habit.next_reminder_at = compute_next_reminder_at(time, periodicity, None, now)
+    return habit
+
+
+def reminder_time(rng: random.Random) -> dt.time:
+    """Случайное время напоминания с суточным профилем ``HOUR_WEIGHTS``."""
+    hour = rng.choices(range(24), cum_weights=_HOUR_CUM_WEIGHTS)[0]
+    if rng.random() < ROUND_MINUTES_SHARE:
+        minute = rng.choice((0, 15, 30, 45))
+    else:
+        minute = rng.randrange(60)
+    return dt.time(hour, minute)
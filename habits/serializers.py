@@ -1,18 +1,48 @@
 from __future__ import annotations
 
+import copy
+
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
 from .models import Habit
 
 
+class RelatedHabitField(serializers.PrimaryKeyRelatedField):
+    """Связанная привычка, загруженная только с полями для ``Habit.clean``.
+
+    Если в контексте есть ``related_habits`` (``{pk: Habit}``, заранее
+    выбранные одним запросом на всю пачку), привычка берётся оттуда.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get("related_habits")
+        if preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            return preloaded[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
 class HabitSerializer(serializers.ModelSerializer):
+    # Связанная привычка загружается один раз и только с полями, которые
+    # нужны Habit.clean (владелец и is_pleasant).
+    related_habit = RelatedHabitField(
+        queryset=Habit.objects.only("id", "user", "is_pleasant"),
+        allow_null=True,
+        required=False,
+    )
+
     class Meta:
         model = Habit
         read_only_fields = (
             "id",
             "user",
             "last_reminded_at",
+            "next_reminder_at",
             "created_at",
             "updated_at",
         )
@@ -29,43 +59,53 @@ class HabitSerializer(serializers.ModelSerializer):
             "duration_seconds",
             "is_public",
             "last_reminded_at",
+            "next_reminder_at",
             "created_at",
             "updated_at",
         )
 
     def validate(self, attrs):
-        """Валидация данных привычки."""
-        user = self.context["request"].user
-        # Создаём временный объект для валидации
+        """Валидация данных привычки.
+
+        Поля уже проверены валидаторами модели на уровне полей сериализатора,
+        здесь остаются только правила ``Habit.clean`` между полями. Проверенный
+        объект сохраняется в ``create``/``update`` без повторной валидации.
+        """
         if self.instance:
-            # При обновлении объединяем текущие данные с новыми
+            # Копия, чтобы при ошибке не испортить self.instance.
+            habit = copy.copy(self.instance)
             for key, value in attrs.items():
-                setattr(self.instance, key, value)
-            habit = self.instance
+                setattr(habit, key, value)
         else:
-            # При создании создаём новый объект
-            habit = Habit(user=user, **attrs)
-        # Вызываем валидацию модели
+            habit = Habit(user=self.context["request"].user, **attrs)
         try:
-            habit.full_clean()
+            habit.clean()
         except DjangoValidationError as exc:
             raise serializers.ValidationError(exc.message_dict) from exc
+        self._habit = habit
         return attrs
 
+    @property
+    def validated_habit(self) -> Habit:
+        """Проверенный, но ещё не сохранённый объект (после ``is_valid()``)."""
+        return self._habit
+
     def create(self, validated_data):
         """Создание новой привычки."""
-        habit = Habit(user=self.context["request"].user, **validated_data)
-        habit.full_clean()  # Валидация модели
-        habit.save()
-        return habit
+        return self._save_habit(validated_data)
 
     def update(self, instance, validated_data):
         """Обновление привычки."""
+        return self._save_habit(validated_data)
+
+    def _save_habit(self, validated_data) -> Habit:
+        habit = self._habit
+        # validated_data совпадает с attrs из validate(), кроме аргументов
+        # serializer.save(**kwargs) — их и доставляем.
         for key, value in validated_data.items():
-            setattr(instance, key, value)
-        instance.full_clean()  # Валидация модели
-        instance.save()
-        return instance
+            setattr(habit, key, value)
+        habit.save()
+        return habit
 
 
 class PublicHabitSerializer(serializers.ModelSerializer):
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .feed import bump_public_feed_version
+from .models import Habit, HabitTombstone
+
+
+@receiver(post_save, sender=Habit)
+def _habit_saved(sender, instance: Habit, **kwargs) -> None:
+    if instance.public_feed_changed():
+        # После коммита: иначе параллельный запрос успеет закешировать
+        # старые данные уже под новой версией.
+        transaction.on_commit(bump_public_feed_version)
+
+
+@receiver(pre_delete, sender=Habit)
+def _habit_deleting(sender, instance: Habit, **kwargs) -> None:
+    # У ссылающихся привычек related_habit обнулится (SET_NULL) без
+    # save(); отмечаем их изменёнными для дельта-синхронизации. Ссылаться
+    # можно только на приятные привычки. Публичная лента тоже показывает
+    # related_habit, поэтому, если среди ссылающихся есть публичные, её
+    # версия меняется (для публичной удаляемой это сделает _habit_deleted).
+    if instance.is_pleasant:
+        linked = Habit.objects.filter(related_habit=instance)
+        if not instance.is_public and linked.filter(is_public=True).exists():
+            transaction.on_commit(bump_public_feed_version)
+        linked.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Habit)
+def _habit_deleted(sender, instance: Habit, **kwargs) -> None:
+    HabitTombstone.objects.create(user_id=instance.user_id, habit_id=instance.pk)
+    if instance.is_public:
+        transaction.on_commit(bump_public_feed_version)
@@ -0,0 +1,62 @@
+"""Дельта-синхронизация привычек (``/api/habits/changes/``).
+
+Клиент передаёт watermark из прошлого ответа и получает привычки,
+изменённые после него, и ID удалённых (по ``HabitTombstone``). Watermark —
+подписанный непрозрачный токен с моментом времени. Новый watermark берётся
+с запасом ``HABITS_SYNC_OVERLAP_SECONDS`` назад: запись, которая ещё не
+закоммичена в момент запроса, попадёт в следующий ответ. Поэтому одна и та
+же привычка может прийти дважды — клиент применяет изменения по ``id``.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import Habit, HabitTombstone
+
+_SALT = "habits.sync"
+
+
+class WatermarkExpired(Exception):
+    """Отметки об удалениях за этот период уже не хранятся."""
+
+
+def encode_watermark(moment: dt.datetime) -> str:
+    return signing.dumps(int(moment.timestamp() * 1_000_000), salt=_SALT)
+
+
+def decode_watermark(token: str) -> dt.datetime:
+    """Момент времени из токена; ``signing.BadSignature``, если токен чужой."""
+    micros = signing.loads(token, salt=_SALT)
+    if not isinstance(micros, int):
+        raise signing.BadSignature("Неверный watermark.")
+    return dt.datetime.fromtimestamp(micros / 1_000_000, tz=dt.timezone.utc)
+
+
+def changes_since(user, since: dt.datetime | None) -> dict:
+    """Изменения привычек пользователя после ``since`` (None — все привычки)."""
+    now = timezone.now()
+    habits = Habit.objects.filter(user=user)
+    deleted: list[int] = []
+    if since is not None:
+        retention = dt.timedelta(days=settings.HABITS_TOMBSTONE_RETENTION_DAYS)
+        if since < now - retention:
+            raise WatermarkExpired
+        habits = habits.filter(updated_at__gt=since)
+        deleted = list(
+            HabitTombstone.objects.filter(user_id=user.pk, deleted_at__gt=since)
+            .values_list("habit_id", flat=True)
+            .distinct()
+        )
+    watermark = now - dt.timedelta(seconds=settings.HABITS_SYNC_OVERLAP_SECONDS)
+    if since is not None:
+        watermark = max(watermark, since)
+    return {
+        "changed": list(habits.order_by("updated_at", "id")),
+        "deleted": deleted,
+        "since": encode_watermark(watermark),
+    }
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .models import HabitTombstone
+
+
+@shared_task
+def prune_habit_tombstones() -> int:
+    """Удалить отметки об удалении старше срока хранения."""
+    cutoff = timezone.now() - dt.timedelta(
+        days=settings.HABITS_TOMBSTONE_RETENTION_DAYS
+    )
+    deleted, _ = HabitTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
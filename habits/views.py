@@ -1,9 +1,18 @@
 from __future__ import annotations
 
-from rest_framework import generics, viewsets
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 
+from . import bulk, feed, sync
 from .models import Habit
+from .pagination import HabitCursorPagination
 from .permissions import IsOwner
 from .serializers import HabitSerializer, PublicHabitSerializer
 
@@ -12,12 +21,85 @@ class HabitViewSet(viewsets.ModelViewSet):
     """ViewSet для работы с привычками пользователя."""
     serializer_class = HabitSerializer
     permission_classes = (IsAuthenticated, IsOwner)
+    pagination_class = HabitCursorPagination
 
     def get_queryset(self):
         return Habit.objects.filter(user=self.request.user)
 
+    @action(detail=False, methods=["post", "patch", "delete"], url_path="bulk")
+    def bulk(self, request):
+        """Пакетное создание (POST), изменение (PATCH) и удаление (DELETE).
+
+        POST — список привычек, PATCH — список объектов с ``id`` и
+        изменяемыми полями, DELETE — список ID. В ответе ``results`` —
+        результат по каждому элементу в том же порядке.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError("Ожидается непустой список.")
+        if len(items) > settings.HABITS_BULK_MAX_BATCH_SIZE:
+            raise ValidationError(
+                f"Не больше {settings.HABITS_BULK_MAX_BATCH_SIZE} элементов за раз."
+            )
+
+        if request.method == "DELETE":
+            return Response({"results": bulk.bulk_delete(request, items)})
+
+        if not all(isinstance(item, dict) for item in items):
+            raise ValidationError("Элементы должны быть объектами.")
+        if request.method == "POST":
+            results = bulk.bulk_create(request, items)
+        else:
+            results = bulk.bulk_update(request, items)
+        return Response({"results": results})
+
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        """Привычки, изменённые после watermark ``since``, и ID удалённых.
+
+        Без ``since`` возвращаются все привычки. В ответе ``since`` — токен
+        для следующего запроса. 410 — токен старше срока хранения удалений,
+        нужна полная синхронизация.
+        """
+        token = request.query_params.get("since")
+        try:
+            since = sync.decode_watermark(token) if token else None
+            result = sync.changes_since(request.user, since)
+        except signing.BadSignature as exc:
+            raise ValidationError({"since": "Неверный watermark."}) from exc
+        except sync.WatermarkExpired:
+            return Response(
+                {"detail": "Watermark устарел, нужна полная синхронизация."},
+                status=status.HTTP_410_GONE,
+            )
+        result["changed"] = self.get_serializer(result["changed"], many=True).data
+        return Response(result)
+
 
 class PublicHabitsListView(generics.ListAPIView):
+    """Публичная лента привычек, кешируется постранично (см. ``habits.feed``)."""
+
     serializer_class = PublicHabitSerializer
     permission_classes = (AllowAny,)
+    pagination_class = HabitCursorPagination
     queryset = Habit.objects.filter(is_public=True)
+
+    def list(self, request, *args, **kwargs):
+        version = feed.public_feed_version()
+        # Страница определяется полным URL: курсор, page_size и хост
+        # (от него зависят ссылки next/previous).
+        digest = feed.page_digest(request.build_absolute_uri())
+        etag = feed.page_etag(version, digest)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={settings.HABITS_PUBLIC_CACHE_MAX_AGE}",
+        }
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = feed.page_cache_key(version, digest)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.HABITS_PUBLIC_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
@@ -1,5 +1,5 @@
 @echo off
 REM Запуск Celery Worker (Windows)
 call .venv\Scripts\activate.bat
-celery -A config worker -l info --pool=solo
+celery -A config worker -l info --pool=solo -Q celery,telegram-updates-0,telegram-updates-1,telegram-updates-2,telegram-updates-3
 pause
@@ -1 +1,12 @@
-# Admin models are not required for this app.
+from __future__ import annotations
+
+from django.contrib import admin
+
+from .models import ReminderDeadLetter
+
+
+@admin.register(ReminderDeadLetter)
+class ReminderDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ("id", "habit", "chat_id", "attempts", "error_code", "created_at")
+    list_filter = ("error_code",)
+    search_fields = ("error", "chat_id")
@@ -1,376 +1,394 @@
 from __future__ import annotations
 
+import threading
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any
+from functools import reduce
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
 
 from habits.models import Habit
 
+from . import messages, queries
+from .chat_users import get_chat_user_cache
 from .services import send_telegram_message, send_telegram_keyboard
+from .state import MemoryStateStore, RedisStateStore, State, get_state_store
 
 User = get_user_model()
 
+# Обработчик сообщения: (chat_id, text, username).
+Handler = Callable[[int, str, "str | None"], None]
+# Middleware оборачивает следующий обработчик цепочки:
+# middleware(chat_id, text, username, call_next).
+Middleware = Callable[[int, str, "str | None", Handler], None]
 
-class BotHandler:
-    """Обработчик команд Telegram бота."""
 
-    def __init__(self, token: str):
+def extract_message(update: dict) -> tuple[int, str, str | None] | None:
+    """Достать (chat_id, text, username) из обновления Telegram."""
+    message = update.get("message")
+    if not message:
+        return None
+    chat_id = message.get("chat", {}).get("id")
+    if not chat_id:
+        return None
+    text = message.get("text", "").strip()
+    username = message.get("from", {}).get("username")
+    return chat_id, text, username
+
+
+def command(*names: str, inline: bool = False):
+    """Зарегистрировать метод ``BotHandler`` как обработчик команд.
+
+    ``inline=True`` — команда не трогает БД и состояние и отвечает одним
+    сообщением, поэтому webhook может вернуть ответ прямо в теле HTTP-ответа.
+    """
+
+    def decorator(func):
+        func.bot_commands = names
+        func.bot_inline = inline
+        return func
+
+    return decorator
+
+
+class BotHandler:
+    """Обработчик команд Telegram бота.
+
+    Команды собираются в словарь ``команда -> метод`` один раз при создании,
+    поэтому маршрутизация сообщения — один поиск в dict. Middleware
+    оборачивают диспетчер и тоже собираются в цепочку один раз.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        states: RedisStateStore | MemoryStateStore | None = None,
+        middlewares: Iterable[Middleware] = (),
+    ):
         self.token = token
-        self.user_states: dict[int, dict[str, Any]] = {}
+        self.states = states or get_state_store()
+        self.commands: dict[str, Handler] = {}
+        self.inline_commands: set[str] = set()
+        for name in dir(type(self)):
+            method = getattr(self, name)
+            for bot_command in getattr(method, "bot_commands", ()):
+                self.commands[bot_command] = method
+                if method.bot_inline:
+                    self.inline_commands.add(bot_command)
+        self._local = threading.local()
+
+        self.middlewares = tuple(middlewares)
+        self._chain: Handler = reduce(
+            lambda call_next, middleware: (
+                lambda chat_id, text, username: middleware(
+                    chat_id, text, username, call_next
+                )
+            ),
+            reversed(self.middlewares),
+            self._dispatch,
+        )
 
     def handle_message(self, chat_id: int, text: str, username: str | None) -> None:
         """Обработка входящего сообщения."""
+        self._chain(chat_id, text, username)
+
+    def can_reply_inline(self, chat_id: int, text: str) -> bool:
+        """Можно ли обработать сообщение прямо в webhook-запросе.
+
+        Да — для inline-команд и неизвестных команд/текста, если у чата нет
+        незавершённого диалога (иначе текст — это ответ на шаг диалога).
+        """
+        name = self._command_name(text)
+        if name in self.commands and name not in self.inline_commands:
+            return False
+        return self.states.get(chat_id) is None
+
+    def handle_inline(
+        self, chat_id: int, text: str, username: str | None
+    ) -> dict | None:
+        """Обработать сообщение и вернуть единственный ответ как вызов Bot API.
+
+        Если обработчик ответил ровно одним сообщением, оно возвращается в
+        виде ``{"method": "sendMessage", ...}`` для тела ответа webhook'а, и
+        отдельный HTTP-запрос к Telegram не нужен. Иначе ответы отправляются
+        как обычно и возвращается None.
+        """
+        with self.collect_replies() as outbox:
+            self.handle_message(chat_id, text, username)
+        if len(outbox) == 1:
+            return {"method": "sendMessage", **outbox[0]}
+        for reply in outbox:
+            self._deliver(reply)
+        return None
+
+    @contextmanager
+    def collect_replies(self):
+        """Копить ответы текущего потока вместо немедленной отправки."""
+        self._local.outbox = outbox = []
+        try:
+            yield outbox
+        finally:
+            self._local.outbox = None
+
+    def _reply(
+        self,
+        chat_id: int,
+        text: str,
+        keyboard: list[list[dict[str, str]]] | None = None,
+    ) -> None:
+        reply: dict = {"chat_id": chat_id, "text": text}
+        if keyboard is not None:
+            reply["reply_markup"] = {"inline_keyboard": keyboard}
+        outbox = getattr(self._local, "outbox", None)
+        if outbox is not None:
+            outbox.append(reply)
+            return
+        self._deliver(reply)
+
+    def _deliver(self, reply: dict) -> None:
+        markup = reply.get("reply_markup")
+        if markup is not None:
+            send_telegram_keyboard(
+                token=self.token,
+                chat_id=reply["chat_id"],
+                text=reply["text"],
+                keyboard=markup["inline_keyboard"],
+            )
+        else:
+            send_telegram_message(
+                token=self.token, chat_id=reply["chat_id"], text=reply["text"]
+            )
+
+    @staticmethod
+    def _command_name(text: str) -> str:
+        return text.split(maxsplit=1)[0].lower() if text.startswith("/") else ""
+
+    def _dispatch(self, chat_id: int, text: str, username: str | None) -> None:
         # Проверяем состояние пользователя (создание привычки)
-        if chat_id in self.user_states:
-            state = self.user_states[chat_id]
-            if state.get("action") == "creating_habit":
-                self._handle_habit_creation(chat_id, text, state)
-                return
+        state = self.states.get(chat_id)
+        if state is not None and state.get("flow") == "create_habit":
+            self._handle_habit_creation(chat_id, text, state)
+            return
 
         # Обработка команд
-        if text.startswith("/"):
-            command = text.split()[0].lower()
-            if command == "/start":
-                self._handle_start(chat_id, username)
-            elif command == "/register":
-                self._handle_register(chat_id, text, username)
-            elif command == "/my_habits":
-                self._handle_my_habits(chat_id)
-            elif command == "/create_habit":
-                self._handle_create_habit_start(chat_id)
-            elif command == "/help":
-                self._handle_help(chat_id)
-            else:
-                self._handle_unknown_command(chat_id)
-        else:
-            self._handle_unknown_command(chat_id)
+        handler = self.commands.get(
+            self._command_name(text), self._handle_unknown_command
+        )
+        handler(chat_id, text, username)
 
-    def _handle_start(self, chat_id: int, username: str | None) -> None:
+    @command("/start")
+    def _handle_start(self, chat_id: int, text: str, username: str | None) -> None:
         """Обработка команды /start."""
         try:
             user = None
             if username:
-                try:
-                    user = User.objects.get(username=username)
+                user = queries.user_by_username(username)
+                if user is not None and user.telegram_chat_id != chat_id:
                     user.telegram_chat_id = chat_id
                     user.save(update_fields=["telegram_chat_id"])
-                except User.DoesNotExist:
-                    pass
 
             if user:
-                message = (
-                    f"Привет, {user.username}! 👋\n\n"
-                    f"Добро пожаловать в трекер привычек!\n\n"
-                    f"Доступные команды:\n"
-                    f"/my_habits - мои привычки\n"
-                    f"/create_habit - создать привычку\n"
-                    f"/help - помощь\n\n"
-                    f"Ваш Chat ID сохранён. Вы будете получать напоминания!"
-                )
+                message = messages.START_KNOWN.format(username=user.username)
             else:
-                message = (
-                    f"Привет! 👋\n\n"
-                    f"Добро пожаловать в трекер привычек!\n\n"
-                    f"Для начала работы зарегистрируйтесь:\n"
-                    f"/register <username> <password>\n\n"
-                    f"Например:\n"
-                    f"/register {username or 'myuser'} mypassword123\n\n"
-                    f"Или используйте /help для списка команд."
-                )
+                message = messages.START_UNKNOWN.format(username=username or "myuser")
 
-            keyboard = [
-                [{"text": "📋 Мои привычки", "callback_data": "my_habits"}],
-                [{"text": "➕ Создать привычку", "callback_data": "create_habit"}],
-                [{"text": "❓ Помощь", "callback_data": "help"}],
-            ]
-            send_telegram_keyboard(
-                token=self.token, chat_id=chat_id, text=message, keyboard=keyboard
-            )
+            self._reply(chat_id, message, keyboard=messages.START_KEYBOARD)
         except Exception as e:
-            send_telegram_message(
-                token=self.token,
-                chat_id=chat_id,
-                text=f"Ошибка: {e}",
-            )
+            self._reply(chat_id, messages.ERROR.format(error=e))
 
+    @command("/register")
     def _handle_register(self, chat_id: int, text: str, username: str | None) -> None:
-        """Обработка команды /register."""
+        """Обработка команды /register.
+
+        Регистрация выполняется прямо здесь, в обработчике обновлений чата:
+        он и так работает вне HTTP-запроса (очередь celery чата или пул
+        потоков polling). Так следующая команда чата видит уже созданного
+        пользователя, а сигнал сохранения сбрасывает кеш того же процесса.
+        """
+        parts = text.split()
+        if len(parts) < 3:
+            self._reply(chat_id, messages.REGISTER_USAGE)
+            return
+
+        self.register_user(chat_id, parts[1], parts[2])
+
+    def register_user(self, chat_id: int, reg_username: str, password: str) -> bool:
+        """Создать пользователя одной вставкой и ответить в чат.
+
+        Занятость username и chat_id проверяет уникальный индекс, а не
+        отдельный запрос перед вставкой, — так нет гонки между двумя
+        одновременными регистрациями.
+        """
         try:
-            parts = text.split()
-            if len(parts) < 3:
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text=(
-                        "Использование: /register <username> <password>\n\n"
-                        "Пример:\n"
-                        "/register myuser mypassword123"
-                    ),
-                )
-                return
-
-            reg_username = parts[1]
-            password = parts[2]
-
-            if User.objects.filter(username=reg_username).exists():
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text=f"Пользователь '{reg_username}' уже существует.",
-                )
-                return
-
-            user = User(username=reg_username)
+            user = User(username=reg_username, telegram_chat_id=chat_id)
             user.set_password(password)
-            user.telegram_chat_id = chat_id
-            user.save()
-
-            message = (
-                f"✅ Регистрация успешна!\n\n"
-                f"Username: {reg_username}\n"
-                f"Chat ID: {chat_id}\n\n"
-                f"Теперь вы можете создавать привычки:\n"
-                f"/create_habit"
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+            except IntegrityError:
+                if queries.user_by_username(reg_username) is not None:
+                    message = messages.REGISTER_EXISTS.format(username=reg_username)
+                else:
+                    message = messages.REGISTER_CHAT_TAKEN
+                self._reply(chat_id, message)
+                return False
+
+            message = messages.REGISTER_SUCCESS.format(
+                username=reg_username, chat_id=chat_id
             )
-            send_telegram_message(token=self.token, chat_id=chat_id, text=message)
+            self._reply(chat_id, message)
+            return True
         except Exception as e:
-            send_telegram_message(
-                token=self.token,
-                chat_id=chat_id,
-                text=f"Ошибка при регистрации: {e}",
-            )
+            self._reply(chat_id, messages.REGISTER_ERROR.format(error=e))
+            return False
 
-    def _handle_my_habits(self, chat_id: int) -> None:
+    @command("/my_habits")
+    def _handle_my_habits(self, chat_id: int, text: str, username: str | None) -> None:
         """Показать список привычек пользователя."""
         try:
-            user = User.objects.filter(telegram_chat_id=chat_id).first()
-            if not user:
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text=(
-                        "Вы не зарегистрированы. Используйте /register для регистрации."
-                    ),
-                )
+            user_id = get_chat_user_cache().user_id(chat_id)
+            if user_id is None:
+                self._reply(chat_id, messages.NOT_REGISTERED)
                 return
 
-            habits = Habit.objects.filter(user=user).order_by("-created_at")[:10]
+            habits = queries.recent_habits(user_id)
 
             if not habits:
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text="У вас пока нет привычек. Создайте первую: /create_habit",
-                )
+                self._reply(chat_id, messages.HABITS_EMPTY)
                 return
 
-            message = "📋 Ваши привычки:\n\n"
-            for i, habit in enumerate(habits, 1):
-                reward_text = ""
-                if habit.reward:
-                    reward_text = f"\nНаграда: {habit.reward}"
-                elif habit.related_habit:
-                    reward_text = f"\nНаграда: {habit.related_habit.action}"
-
-                message += (
-                    f"{i}. {habit.action}\n"
-                    f"   🕐 {habit.time.strftime('%H:%M')}\n"
-                    f"   📍 {habit.place}\n"
-                    f"   ⏱ {habit.duration_seconds}с{reward_text}\n"
-                    f"   🔄 Каждые {habit.periodicity} дн.\n\n"
-                )
-
-            send_telegram_message(token=self.token, chat_id=chat_id, text=message)
+            message = messages.render_habit_list(habits)
+            self._reply(chat_id, message)
         except Exception as e:
-            send_telegram_message(
-                token=self.token,
-                chat_id=chat_id,
-                text=f"Ошибка: {e}",
-            )
+            self._reply(chat_id, messages.ERROR.format(error=e))
 
-    def _handle_create_habit_start(self, chat_id: int) -> None:
+    @command("/create_habit")
+    def _handle_create_habit_start(
+        self, chat_id: int, text: str, username: str | None
+    ) -> None:
         """Начать процесс создания привычки."""
         try:
-            user = User.objects.filter(telegram_chat_id=chat_id).first()
-            if not user:
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text=(
-                        "Вы не зарегистрированы. Используйте /register для регистрации."
-                    ),
-                )
+            user_id = get_chat_user_cache().user_id(chat_id)
+            if user_id is None:
+                self._reply(chat_id, messages.NOT_REGISTERED)
                 return
 
-            self.user_states[chat_id] = {
-                "action": "creating_habit",
-                "step": "action",
-                "user": user,
-            }
-
-            message = (
-                "Создание новой привычки 📝\n\n"
-                "Шаг 1/5: Что вы будете делать?\n"
-                "Напишите действие (например: 'выпить стакан воды')"
+            self.states.set(
+                chat_id,
+                {"flow": "create_habit", "step": "action", "user_id": str(user_id)},
             )
-            send_telegram_message(token=self.token, chat_id=chat_id, text=message)
+
+            self._reply(chat_id, messages.CREATE_STEP_ACTION)
         except Exception as e:
-            send_telegram_message(
-                token=self.token,
-                chat_id=chat_id,
-                text=f"Ошибка: {e}",
-            )
+            self._reply(chat_id, messages.ERROR.format(error=e))
 
-    def _handle_habit_creation(self, chat_id: int, text: str, state: dict) -> None:
+    def _handle_habit_creation(self, chat_id: int, text: str, state: State) -> None:
         """Обработка пошагового создания привычки."""
         try:
             step = state.get("step")
-            user = state.get("user")
 
             if step == "action":
                 state["action_text"] = text
                 state["step"] = "place"
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text="Шаг 2/5: Где? (например: 'дома', 'в офисе')",
-                )
+                self.states.set(chat_id, state)
+                self._reply(chat_id, messages.CREATE_STEP_PLACE)
             elif step == "place":
                 state["place"] = text
                 state["step"] = "time"
-                send_telegram_message(
-                    token=self.token,
-                    chat_id=chat_id,
-                    text=(
-                        "Шаг 3/5: Во сколько? (формат: ЧЧ:ММ, например: 08:00)"
-                    ),
-                )
+                self.states.set(chat_id, state)
+                self._reply(chat_id, messages.CREATE_STEP_TIME)
             elif step == "time":
                 try:
                     time_obj = datetime.strptime(text, "%H:%M").time()
-                    state["time"] = time_obj
+                    state["time"] = time_obj.strftime("%H:%M")
                     state["step"] = "duration"
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text=(
-                            "Шаг 4/5: Сколько времени займёт? "
-                            "(в секундах, максимум 120, например: 60)"
-                        ),
-                    )
+                    self.states.set(chat_id, state)
+                    self._reply(chat_id, messages.CREATE_STEP_DURATION)
                 except ValueError:
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text=(
-                            "Неверный формат времени. "
-                            "Используйте ЧЧ:ММ (например: 08:00)"
-                        ),
-                    )
+                    self._reply(chat_id, messages.CREATE_BAD_TIME)
             elif step == "duration":
                 try:
                     duration = int(text)
                     if duration > 120:
-                        send_telegram_message(
-                            token=self.token,
-                            chat_id=chat_id,
-                            text="Максимум 120 секунд. Введите число от 1 до 120:",
-                        )
+                        self._reply(chat_id, messages.CREATE_DURATION_TOO_LONG)
                         return
-                    state["duration"] = duration
+                    state["duration"] = str(duration)
                     state["step"] = "periodicity"
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text=(
-                            "Шаг 5/5: Как часто? (дней, от 1 до 7, например: 1)"
-                        ),
-                    )
+                    self.states.set(chat_id, state)
+                    self._reply(chat_id, messages.CREATE_STEP_PERIODICITY)
                 except ValueError:
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text="Введите число (например: 60)",
-                    )
+                    self._reply(chat_id, messages.CREATE_BAD_DURATION)
             elif step == "periodicity":
                 try:
                     periodicity = int(text)
                     if periodicity < 1 or periodicity > 7:
-                        send_telegram_message(
-                            token=self.token,
-                            chat_id=chat_id,
-                            text="Введите число от 1 до 7:",
-                        )
+                        self._reply(chat_id, messages.CREATE_BAD_PERIODICITY)
                         return
 
                     # Создаём привычку
                     with transaction.atomic():
                         habit = Habit.objects.create(
-                            user=user,
+                            user_id=int(state["user_id"]),
                             action=state["action_text"],
                             place=state["place"],
-                            time=state["time"],
-                            duration_seconds=state["duration"],
+                            time=datetime.strptime(state["time"], "%H:%M").time(),
+                            duration_seconds=int(state["duration"]),
                             periodicity=periodicity,
                         )
 
-                    message = (
-                        f"✅ Привычка создана!\n\n"
-                        f"Действие: {habit.action}\n"
-                        f"Место: {habit.place}\n"
-                        f"Время: {habit.time.strftime('%H:%M')}\n"
-                        f"Длительность: {habit.duration_seconds}с\n"
-                        f"Периодичность: каждые {habit.periodicity} дн.\n\n"
-                        f"Вы будете получать напоминания!"
-                    )
-                    send_telegram_message(
-                        token=self.token, chat_id=chat_id, text=message
-                    )
+                    self._reply(chat_id, messages.render_habit_created(habit))
 
                     # Удаляем состояние
-                    del self.user_states[chat_id]
+                    self.states.delete(chat_id)
                 except ValueError:
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text="Введите число от 1 до 7:",
-                    )
+                    self._reply(chat_id, messages.CREATE_BAD_PERIODICITY)
                 except Exception as e:
-                    send_telegram_message(
-                        token=self.token,
-                        chat_id=chat_id,
-                        text=f"Ошибка при создании: {e}",
-                    )
-                    del self.user_states[chat_id]
+                    self._reply(chat_id, messages.CREATE_ERROR.format(error=e))
+                    self.states.delete(chat_id)
         except Exception as e:
-            send_telegram_message(
-                token=self.token,
-                chat_id=chat_id,
-                text=f"Ошибка: {e}",
-            )
-            if chat_id in self.user_states:
-                del self.user_states[chat_id]
+            self._reply(chat_id, messages.ERROR.format(error=e))
+            self.states.delete(chat_id)
 
-    def _handle_help(self, chat_id: int) -> None:
+    @command("/help", inline=True)
+    def _handle_help(self, chat_id: int, text: str, username: str | None) -> None:
         """Показать справку."""
-        message = (
-            "📖 Справка по командам:\n\n"
-            "/start - начать работу\n"
-            "/register <username> <password> - регистрация\n"
-            "/my_habits - список моих привычек\n"
-            "/create_habit - создать новую привычку\n"
-            "/help - эта справка\n\n"
-            "Пример регистрации:\n"
-            "/register myuser mypass123\n\n"
-            "После регистрации используйте /create_habit для создания привычек."
-        )
-        send_telegram_message(token=self.token, chat_id=chat_id, text=message)
+        self._reply(chat_id, messages.HELP)
 
-    def _handle_unknown_command(self, chat_id: int) -> None:
+    def _handle_unknown_command(
+        self, chat_id: int, text: str, username: str | None
+    ) -> None:
         """Обработка неизвестной команды."""
-        message = (
-            "Неизвестная команда. Используйте /help для списка команд."
-        )
-        send_telegram_message(token=self.token, chat_id=chat_id, text=message)
+        self._reply(chat_id, messages.UNKNOWN_COMMAND)
+
+
+_handlers: dict[str, BotHandler] = {}
+_handlers_lock = threading.Lock()
+
+
+def get_bot_handler() -> BotHandler | None:
+    """Общий для процесса обработчик бота (None, если токен не задан).
+
+    Создаётся один раз: токен берётся из настроек, middleware — из
+    ``TELEGRAM_BOT_MIDDLEWARES`` (пути импорта).
+    """
+    token = settings.TELEGRAM_BOT_TOKEN
+    if not token:
+        return None
+    handler = _handlers.get(token)
+    if handler is None:
+        with _handlers_lock:
+            handler = _handlers.get(token)
+            if handler is None:
+                handler = BotHandler(
+                    token,
+                    middlewares=[
+                        import_string(path)
+                        for path in settings.TELEGRAM_BOT_MIDDLEWARES
+                    ],
+                )
+                _handlers[token] = handler
+    return handler
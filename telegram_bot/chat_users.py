@@ -0,0 +1,121 @@
+"""Кеш соответствия chat_id -> user_id для команд бота.
+
+Почти каждая команда начинается с поиска пользователя по chat_id. Ответ
+кешируется в двух уровнях: словарь в памяти процесса с коротким TTL и
+Redis с длинным (общий для всех процессов). Запоминается и отсутствие
+пользователя, чтобы незарегистрированные чаты тоже не ходили в БД.
+
+Кеш сбрасывается сигналами ``post_save``/``post_delete`` пользователя
+(``telegram_bot.signals``) при любой смене chat_id — из бота, API или
+админки — и при удалении. Локальный уровень других процессов так не
+сбросить, поэтому его TTL — секунды.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .services import get_redis
+
+User = get_user_model()
+
+# Отметка «у чата нет пользователя» (user_id не бывает нулевым).
+_NO_USER = 0
+
+
+class ChatUserCache:
+    prefix = "telegram:chat_user"
+
+    def __init__(
+        self,
+        client: redis.Redis | None,
+        *,
+        ttl: int,
+        local_ttl: float,
+        maxsize: int,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.maxsize = maxsize
+        self._local: OrderedDict[int, tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, chat_id: int) -> str:
+        return f"{self.prefix}:{chat_id}"
+
+    def user_id(self, chat_id: int) -> int | None:
+        """user_id пользователя с этим chat_id или None."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._local.get(chat_id)
+            if item is not None and item[0] > now:
+                self._local.move_to_end(chat_id)
+                return item[1] or None
+
+        value = None
+        if self.client is not None:
+            raw = self.client.get(self._key(chat_id))
+            if raw is not None:
+                value = int(raw)
+        if value is None:
+            value = (
+                User.objects.filter(telegram_chat_id=chat_id)
+                .values_list("pk", flat=True)
+                .first()
+            ) or _NO_USER
+            if self.client is not None:
+                self.client.set(self._key(chat_id), value, ex=self.ttl)
+
+        self._remember(chat_id, value, now)
+        return value or None
+
+    def forget(self, *chat_ids: int | None) -> None:
+        chat_ids = tuple(chat_id for chat_id in chat_ids if chat_id is not None)
+        if not chat_ids:
+            return
+        with self._lock:
+            for chat_id in chat_ids:
+                self._local.pop(chat_id, None)
+        if self.client is not None:
+            self.client.delete(*(self._key(chat_id) for chat_id in chat_ids))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def _remember(self, chat_id: int, value: int, now: float) -> None:
+        with self._lock:
+            self._local[chat_id] = (now + self.local_ttl, value)
+            self._local.move_to_end(chat_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+
+_caches: dict[str, ChatUserCache] = {}
+
+
+def get_chat_user_cache() -> ChatUserCache:
+    """Кеш chat_id -> user_id для текущего процесса."""
+    client = get_redis()
+    backend = "redis" if client is not None else "memory"
+    cache = _caches.get(backend)
+    if cache is None:
+        cache = _caches[backend] = ChatUserCache(
+            client,
+            ttl=settings.TELEGRAM_CHAT_USER_CACHE_TTL,
+            local_ttl=settings.TELEGRAM_CHAT_USER_LOCAL_TTL,
+            maxsize=settings.TELEGRAM_CHAT_USER_CACHE_SIZE,
+        )
+    return cache
+
+
+def forget_chats(*chat_ids: int | None) -> None:
+    """Сбросить кеш для чатов, чья привязка к пользователю изменилась."""
+    get_chat_user_cache().forget(*chat_ids)
@@ -0,0 +1,112 @@
+"""Защита от повторной доставки обновлений Telegram.
+
+Telegram переотправляет обновление, если webhook ответил не сразу, а
+polling после перезапуска может получить уже обработанную пачку. Перед
+обработкой обновление «забирается» по ``update_id``: первая доставка
+проходит, повторные отбрасываются за одну операцию O(1). В проде отметки
+лежат в Redis (``SET NX`` с TTL) и общие для всех процессов, без Redis —
+скользящее битовое окно в памяти процесса. Если принять обновление не
+удалось (например, недоступен брокер), отметка снимается через
+``release``, чтобы повторная доставка Telegram не была отброшена.
+"""
+
+from __future__ import annotations
+
+import threading
+
+import redis
+from django.conf import settings
+
+from .services import get_redis
+
+
+class RedisUpdateDeduplicator:
+    prefix = "telegram:update"
+
+    def __init__(self, client: redis.Redis, *, ttl: int):
+        self.client = client
+        self.ttl = ttl
+
+    def claim(self, update_id: int) -> bool:
+        """True, если обновление пришло впервые."""
+        return bool(
+            self.client.set(f"{self.prefix}:{update_id}", 1, nx=True, ex=self.ttl)
+        )
+
+    def release(self, update_id: int) -> None:
+        """Снять отметку: обновление не обработано и должно прийти снова."""
+        self.client.delete(f"{self.prefix}:{update_id}")
+
+
+class MemoryUpdateDeduplicator:
+    """Битовое окно из последних ``window`` update_id.
+
+    ``update_id`` у бота растут, поэтому достаточно помнить старший номер и
+    маску отметок ниже него: бит ``i`` — пришёл ли ``high - i``. Номер
+    ниже окна считается новым и начинает окно заново: после недели без
+    обновлений Telegram может начать нумерацию со случайного, в том числе
+    меньшего, значения.
+    """
+
+    def __init__(self, *, window: int):
+        self.window = window
+        self._mask = (1 << window) - 1
+        self._high: int | None = None
+        self._bits = 0
+        self._lock = threading.Lock()
+
+    def claim(self, update_id: int) -> bool:
+        """True, если обновление пришло впервые."""
+        with self._lock:
+            if self._high is None or update_id > self._high:
+                shift = update_id - self._high if self._high is not None else 0
+                if shift >= self.window:
+                    self._bits = 1
+                else:
+                    self._bits = ((self._bits << shift) | 1) & self._mask
+                self._high = update_id
+                return True
+            offset = self._high - update_id
+            if offset >= self.window:
+                self._high = update_id
+                self._bits = 1
+                return True
+            if self._bits >> offset & 1:
+                return False
+            self._bits |= 1 << offset
+            return True
+
+    def release(self, update_id: int) -> None:
+        """Снять отметку: обновление не обработано и должно прийти снова."""
+        with self._lock:
+            if self._high is None:
+                return
+            offset = self._high - update_id
+            if 0 <= offset < self.window:
+                self._bits &= ~(1 << offset)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._high = None
+            self._bits = 0
+
+
+_deduplicators: dict[str, RedisUpdateDeduplicator | MemoryUpdateDeduplicator] = {}
+
+
+def get_update_deduplicator() -> RedisUpdateDeduplicator | MemoryUpdateDeduplicator:
+    """Дедупликатор обновлений для текущего процесса."""
+    client = get_redis()
+    backend = "redis" if client is not None else "memory"
+    deduplicator = _deduplicators.get(backend)
+    if deduplicator is None:
+        if client is not None:
+            deduplicator = RedisUpdateDeduplicator(
+                client, ttl=settings.TELEGRAM_UPDATE_DEDUP_TTL
+            )
+        else:
+            deduplicator = MemoryUpdateDeduplicator(
+                window=settings.TELEGRAM_UPDATE_DEDUP_WINDOW
+            )
+        _deduplicators[backend] = deduplicator
+    return deduplicator
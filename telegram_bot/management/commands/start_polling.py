@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
 from django.core.management.base import BaseCommand
 
-from telegram_bot.bot_handler import BotHandler
+from telegram_bot.bot_handler import BotHandler, extract_message, get_bot_handler
+from telegram_bot.dedup import get_update_deduplicator
+from telegram_bot.polling import ChatWorkerPool
+from telegram_bot.services import TelegramClient, TelegramError, get_telegram_client
 
 
 class Command(BaseCommand):
@@ -22,83 +25,108 @@ class Command(BaseCommand):
             default=30,
             help="Timeout для long polling (по умолчанию 30 секунд)",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Число потоков-обработчиков; сообщения одного чата всегда "
+                "обрабатываются по порядку (по умолчанию 1)"
+            ),
+        )
 
     def handle(self, *args, **options):
-        token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-        if not token:
+        bot_handler = get_bot_handler()
+        if bot_handler is None:
             self.stdout.write(
                 self.style.ERROR("TELEGRAM_BOT_TOKEN не установлен в .env")
             )
             return
 
         timeout = options["timeout"]
-        api_url = f"https://api.telegram.org/bot{token}/getUpdates"
+        workers = options["workers"]
+        client = get_telegram_client(bot_handler.token)
         offset = 0
 
-        # Создаём обработчик бота
-        bot_handler = BotHandler(token)
-
         self.stdout.write(
             self.style.SUCCESS(
-                f"Запущен polling для бота (timeout={timeout}с). "
-                "Нажмите Ctrl+C для остановки."
+                f"Запущен polling для бота (timeout={timeout}с, "
+                f"workers={workers}). Нажмите Ctrl+C для остановки."
             )
         )
 
+        pool = ChatWorkerPool(
+            workers, lambda update: self._handle_update(bot_handler, update)
+        )
+        fetcher = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="telegram-get-updates"
+        )
+        deduplicator = get_update_deduplicator()
+        poll = self._poll(fetcher, client, offset, timeout)
         try:
             while True:
                 try:
-                    response = requests.post(
-                        api_url,
-                        json={"offset": offset, "timeout": timeout},
-                        timeout=timeout + 10,
-                    )
-                    data = response.json()
-
-                    if not data.get("ok"):
-                        self.stdout.write(
-                            self.style.ERROR(f"Ошибка API: {data.get('description')}")
-                        )
-                        time.sleep(5)
-                        continue
-
-                    updates = data.get("result", [])
-                    for update in updates:
-                        offset = update["update_id"] + 1
-                        self._handle_update(bot_handler, update)
-
+                    updates = poll.result().get("result", [])
+                except TelegramError as e:
+                    self.stdout.write(self.style.ERROR(f"Ошибка API: {e}"))
+                    time.sleep(5)
+                    poll = self._poll(fetcher, client, offset, timeout)
+                    continue
                 except requests.exceptions.RequestException as e:
                     self.stdout.write(
                         self.style.WARNING(f"Ошибка сети: {e}. Повтор через 5 сек...")
                     )
                     time.sleep(5)
-                except KeyboardInterrupt:
-                    self.stdout.write(self.style.SUCCESS("\nPolling остановлен"))
-                    break
+                    poll = self._poll(fetcher, client, offset, timeout)
+                    continue
                 except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Неожиданная ошибка: {e}")
-                    )
+                    self.stdout.write(self.style.ERROR(f"Неожиданная ошибка: {e}"))
                     time.sleep(5)
+                    poll = self._poll(fetcher, client, offset, timeout)
+                    continue
+
+                for update in updates:
+                    offset = update["update_id"] + 1
+                    # После перезапуска Telegram может отдать уже обработанное.
+                    if not deduplicator.claim(update["update_id"]):
+                        continue
+                    message = extract_message(update)
+                    if message is not None:
+                        pool.submit(message[0], update)
+
+                # Следующий long poll идёт, пока пул разбирает пачку. Новый
+                # offset подтверждает Telegram'у только эту пачку, а запрос,
+                # подтверждающий следующую, уйдёт лишь когда эта обработана.
+                poll = self._poll(fetcher, client, offset, timeout)
+                pool.join()
 
         except KeyboardInterrupt:
             self.stdout.write(self.style.SUCCESS("\nPolling остановлен"))
+        finally:
+            # Уже полученные обновления дорабатываем, висящий long poll — нет.
+            pool.close()
+            fetcher.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _poll(
+        fetcher: ThreadPoolExecutor, client: TelegramClient, offset: int, timeout: int
+    ) -> Future:
+        return fetcher.submit(
+            client.call,
+            "getUpdates",
+            {"offset": offset, "timeout": timeout},
+            timeout=timeout + 10,
+        )
 
     def _handle_update(self, bot_handler: BotHandler, update: dict):
         """Обработка одного обновления от Telegram."""
-        if "message" not in update:
-            return
-
-        message = update["message"]
-        chat_id = message.get("chat", {}).get("id")
-        text = message.get("text", "").strip()
-        username = message.get("from", {}).get("username")
-
-        if not chat_id:
+        message = extract_message(update)
+        if message is None:
             return
 
+        chat_id, text, _ = message
         try:
-            bot_handler.handle_message(chat_id, text, username)
+            bot_handler.handle_message(*message)
             self.stdout.write(
                 f"Обработано сообщение от chat_id={chat_id}: {text[:50]}"
             )
@@ -0,0 +1,220 @@
+"""Тексты сообщений бота и их рендеринг.
+
+Все тексты собраны здесь как константы-шаблоны ``str.format``. Пункты
+списка ``/my_habits`` кешируются по ``(pk, updated_at)`` привычки и
+связанной привычки: список запрашивают повторно, и его пункты почти не
+меняются. Напоминания не кешируются: привычка напоминает о себе раз в
+сутки и реже, кеш между рассылками не доживает, а промах дороже простой
+отрисовки. Бенчмарк: ``benchmarks/test_bench_messages.py``.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+
+from django.conf import settings
+
+from habits.models import Habit
+
+REMINDER = (
+    "Напоминание о привычке:\n"
+    "Действие: {action}\n"
+    "Место: {place}\n"
+    "Время: {time}{reward}"
+)
+REMINDER_REWARD = "\nНаграда: {reward}"
+RELATED_HABIT_REWARD = "Приятная привычка: {action}"
+
+HABITS_HEADER = "📋 Ваши привычки:\n\n"
+HABITS_ITEM = (
+    "{action}\n"
+    "   🕐 {time}\n"
+    "   📍 {place}\n"
+    "   ⏱ {duration}с{reward}\n"
+    "   🔄 Каждые {periodicity} дн.\n\n"
+)
+HABITS_ITEM_REWARD = "\nНаграда: {reward}"
+HABITS_EMPTY = "У вас пока нет привычек. Создайте первую: /create_habit"
+
+HABIT_CREATED = (
+    "✅ Привычка создана!\n\n"
+    "Действие: {action}\n"
+    "Место: {place}\n"
+    "Время: {time}\n"
+    "Длительность: {duration}с\n"
+    "Периодичность: каждые {periodicity} дн.\n\n"
+    "Вы будете получать напоминания!"
+)
+
+START_KNOWN = (
+    "Привет, {username}! 👋\n\n"
+    "Добро пожаловать в трекер привычек!\n\n"
+    "Доступные команды:\n"
+    "/my_habits - мои привычки\n"
+    "/create_habit - создать привычку\n"
+    "/help - помощь\n\n"
+    "Ваш Chat ID сохранён. Вы будете получать напоминания!"
+)
+START_UNKNOWN = (
+    "Привет! 👋\n\n"
+    "Добро пожаловать в трекер привычек!\n\n"
+    "Для начала работы зарегистрируйтесь:\n"
+    "/register <username> <password>\n\n"
+    "Например:\n"
+    "/register {username} mypassword123\n\n"
+    "Или используйте /help для списка команд."
+)
+START_KEYBOARD = [
+    [{"text": "📋 Мои привычки", "callback_data": "my_habits"}],
+    [{"text": "➕ Создать привычку", "callback_data": "create_habit"}],
+    [{"text": "❓ Помощь", "callback_data": "help"}],
+]
+
+REGISTER_USAGE = (
+    "Использование: /register <username> <password>\n\n"
+    "Пример:\n"
+    "/register myuser mypassword123"
+)
+REGISTER_EXISTS = "Пользователь '{username}' уже существует."
+REGISTER_SUCCESS = (
+    "✅ Регистрация успешна!\n\n"
+    "Username: {username}\n"
+    "Chat ID: {chat_id}\n\n"
+    "Теперь вы можете создавать привычки:\n"
+    "/create_habit"
+)
+REGISTER_CHAT_TAKEN = "Этот чат уже привязан к другому пользователю."
+REGISTER_ERROR = "Ошибка при регистрации: {error}"
+
+NOT_REGISTERED = "Вы не зарегистрированы. Используйте /register для регистрации."
+
+CREATE_STEP_ACTION = (
+    "Создание новой привычки 📝\n\n"
+    "Шаг 1/5: Что вы будете делать?\n"
+    "Напишите действие (например: 'выпить стакан воды')"
+)
+CREATE_STEP_PLACE = "Шаг 2/5: Где? (например: 'дома', 'в офисе')"
+CREATE_STEP_TIME = "Шаг 3/5: Во сколько? (формат: ЧЧ:ММ, например: 08:00)"
+CREATE_BAD_TIME = "Неверный формат времени. Используйте ЧЧ:ММ (например: 08:00)"
+CREATE_STEP_DURATION = (
+    "Шаг 4/5: Сколько времени займёт? (в секундах, максимум 120, например: 60)"
+)
+CREATE_DURATION_TOO_LONG = "Максимум 120 секунд. Введите число от 1 до 120:"
+CREATE_BAD_DURATION = "Введите число (например: 60)"
+CREATE_STEP_PERIODICITY = "Шаг 5/5: Как часто? (дней, от 1 до 7, например: 1)"
+CREATE_BAD_PERIODICITY = "Введите число от 1 до 7:"
+CREATE_ERROR = "Ошибка при создании: {error}"
+
+HELP = (
+    "📖 Справка по командам:\n\n"
+    "/start - начать работу\n"
+    "/register <username> <password> - регистрация\n"
+    "/my_habits - список моих привычек\n"
+    "/create_habit - создать новую привычку\n"
+    "/help - эта справка\n\n"
+    "Пример регистрации:\n"
+    "/register myuser mypass123\n\n"
+    "После регистрации используйте /create_habit для создания привычек."
+)
+UNKNOWN_COMMAND = "Неизвестная команда. Используйте /help для списка команд."
+ERROR = "Ошибка: {error}"
+
+
+class _RenderCache:
+    """Небольшой потокобезопасный LRU для отрисованных текстов."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: tuple, render: Callable[[], str]) -> str:
+        # Попадание читается без блокировки: get/move_to_end атомарны под GIL,
+        # а ключ мог быть вытеснен другим потоком — тогда просто рисуем заново.
+        text = self._data.get(key)
+        if text is not None:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                pass
+            return text
+        text = render()
+        with self._lock:
+            self._data[key] = text
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _RenderCache(settings.TELEGRAM_RENDER_CACHE_SIZE)
+
+
+def clear_render_cache() -> None:
+    _cache.clear()
+
+
+def _cache_key(kind: str, habit: Habit) -> tuple:
+    related = habit.related_habit if habit.related_habit_id else None
+    return (
+        kind,
+        habit.pk,
+        habit.updated_at,
+        habit.related_habit_id,
+        related.updated_at if related is not None else None,
+    )
+
+
+def _render_habit_item(habit: Habit) -> str:
+    reward = habit.reward
+    if not reward and habit.related_habit:
+        reward = habit.related_habit.action
+    return HABITS_ITEM.format(
+        action=habit.action,
+        time=habit.time.strftime("%H:%M"),
+        place=habit.place,
+        duration=habit.duration_seconds,
+        reward=HABITS_ITEM_REWARD.format(reward=reward) if reward else "",
+        periodicity=habit.periodicity,
+    )
+
+
+def render_reminder(habit: Habit) -> str:
+    """Текст напоминания о привычке."""
+    reward = habit.reward
+    if habit.related_habit_id:
+        reward = RELATED_HABIT_REWARD.format(action=habit.related_habit.action)
+    return REMINDER.format(
+        action=habit.action,
+        place=habit.place,
+        # То же «ЧЧ:ММ», что и strftime("%H:%M"), но втрое быстрее.
+        time=habit.time.isoformat("minutes"),
+        reward=REMINDER_REWARD.format(reward=reward) if reward else "",
+    )
+
+
+def render_habit_list(habits: Iterable[Habit]) -> str:
+    """Список привычек для /my_habits одной склейкой."""
+    items = [
+        f"{number}. "
+        + _cache.get_or_render(
+            _cache_key("item", habit), lambda habit=habit: _render_habit_item(habit)
+        )
+        for number, habit in enumerate(habits, 1)
+    ]
+    return HABITS_HEADER + "".join(items)
+
+
+def render_habit_created(habit: Habit) -> str:
+    return HABIT_CREATED.format(
+        action=habit.action,
+        place=habit.place,
+        time=habit.time.strftime("%H:%M"),
+        duration=habit.duration_seconds,
+        periodicity=habit.periodicity,
+    )
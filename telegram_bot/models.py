@@ -1 +1,26 @@
-# This app is responsible for Telegram integration (services + celery tasks).
+from __future__ import annotations
+
+from django.db import models
+
+
+class ReminderDeadLetter(models.Model):
+    """Напоминание, которое не удалось доставить после всех повторов."""
+
+    habit = models.ForeignKey(
+        "habits.Habit",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="reminder_dead_letters",
+    )
+    chat_id = models.BigIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=1)
+    error_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:
+        return f"{self.habit_id} -> {self.chat_id}: {self.error_code or self.error}"
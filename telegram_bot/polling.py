@@ -0,0 +1,72 @@
+"""Пул потоков для обработки обновлений в режиме polling."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from collections.abc import Callable
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+class ChatWorkerPool:
+    """Обрабатывает обновления в ``workers`` потоках с порядком внутри чата.
+
+    У каждого потока своя очередь, обновление попадает в очередь
+    ``chat_id % workers``: сообщения одного чата идут строго по порядку,
+    а медленный обработчик задерживает только «свои» чаты.
+    """
+
+    def __init__(self, workers: int, handle: Callable[[dict], None]):
+        if workers < 1:
+            raise ValueError("workers должен быть >= 1")
+        self._handle = handle
+        self._queues: list[queue.Queue[dict | None]] = [
+            queue.Queue() for _ in range(workers)
+        ]
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(worker_queue,),
+                name=f"telegram-polling-{number}",
+                daemon=True,
+            )
+            for number, worker_queue in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, chat_id: int, update: dict) -> None:
+        self._queues[chat_id % len(self._queues)].put(update)
+
+    def join(self) -> None:
+        """Дождаться обработки всего, что уже поставлено в очереди."""
+        for worker_queue in self._queues:
+            worker_queue.join()
+
+    def close(self) -> None:
+        """Доработать очереди и остановить потоки."""
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, worker_queue: queue.Queue[dict | None]) -> None:
+        try:
+            while True:
+                update = worker_queue.get()
+                try:
+                    if update is None:
+                        return
+                    close_old_connections()
+                    self._handle(update)
+                except Exception:
+                    # Падение одного обработчика не должно останавливать поток.
+                    logger.exception("Ошибка обработки обновления Telegram")
+                finally:
+                    worker_queue.task_done()
+        finally:
+            connection.close()
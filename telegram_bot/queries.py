@@ -0,0 +1,50 @@
+"""Запросы к БД, которые используют бот и задачи рассылки.
+
+Все выборки привычек сразу подтягивают ``related_habit`` и ``user``, чтобы
+отрисовка текстов не делала по запросу на каждую привычку.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from collections.abc import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+
+from habits.models import Habit
+
+User = get_user_model()
+
+HABITS_LIST_LIMIT = 10
+
+
+def habits_with_relations() -> QuerySet[Habit]:
+    return Habit.objects.select_related("related_habit", "user")
+
+
+def user_by_username(username: str):
+    return User.objects.filter(username=username).first()
+
+
+def recent_habits(user_id: int, limit: int = HABITS_LIST_LIMIT) -> list[Habit]:
+    """Последние привычки пользователя для /my_habits."""
+    return list(
+        habits_with_relations()
+        .filter(user_id=user_id)
+        .order_by("-created_at", "-id")[:limit]
+    )
+
+
+def habits_by_ids(
+    habit_ids: Iterable[int], *, lease_until: dt.datetime | None = None
+) -> QuerySet[Habit]:
+    """Привычки по ID; с ``lease_until`` — только всё ещё захваченные им."""
+    queryset = habits_with_relations().filter(pk__in=habit_ids)
+    if lease_until is not None:
+        queryset = queryset.filter(next_reminder_at=lease_until)
+    return queryset
+
+
+def habit_by_id(habit_id: int) -> Habit | None:
+    return habits_with_relations().filter(pk=habit_id).first()
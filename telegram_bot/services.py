@@ -1,41 +1,356 @@
 from __future__ import annotations
 
+import math
+import os
+import threading
+import time
+from collections.abc import Hashable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+import redis
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 
 class TelegramError(RuntimeError):
-    pass
+    def __init__(self, message: str, *, error_code: int | None = None):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class TelegramRetryAfter(TelegramError):
+    """Telegram (или собственный лимитер) просит повторить позже."""
+
+    def __init__(self, message: str, *, retry_after: float):
+        super().__init__(message, error_code=429)
+        self.retry_after = retry_after
+
+
+_redis_clients: dict[int, redis.Redis] = {}
+
+
+def get_redis() -> redis.Redis | None:
+    """Общее для процесса подключение к Redis или None, если он не задан."""
+    if not settings.REDIS_URL:
+        return None
+    pid = os.getpid()
+    client = _redis_clients.get(pid)
+    if client is None:
+        client = _redis_clients[pid] = redis.Redis.from_url(settings.REDIS_URL)
+    return client
+
+
+# Два token bucket (глобальный и на чат) плюс ключ паузы после 429,
+# проверяются и списываются атомарно. Возвращает 0, если отправлять можно,
+# иначе — сколько миллисекунд подождать.
+_TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local paused = redis.call('PTTL', KEYS[3])
+if paused > 0 then
+    return paused
+end
+
+local function refill(key, rate, burst)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or burst
+    local ts = tonumber(data[2]) or now
+    return math.min(burst, tokens + (now - ts) * rate / 1000)
+end
+
+local g_rate, g_burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local c_rate, c_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local g = refill(KEYS[1], g_rate, g_burst)
+local c = refill(KEYS[2], c_rate, c_burst)
+if g < 1 or c < 1 then
+    local wait = 0
+    if g < 1 then wait = math.ceil((1 - g) * 1000 / g_rate) end
+    if c < 1 then wait = math.max(wait, math.ceil((1 - c) * 1000 / c_rate)) end
+    return wait
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(g - 1), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(g_burst * 1000 / g_rate) + 1000)
+redis.call('HSET', KEYS[2], 'tokens', tostring(c - 1), 'ts', now)
+redis.call('PEXPIRE', KEYS[2], math.ceil(c_burst * 1000 / c_rate) + 1000)
+return 0
+"""
+
+
+class RedisRateLimiter:
+    """Лимитер отправки, общий для всех процессов через Redis.
+
+    Глобальный лимит бота (~30 msg/s) и лимит на чат (~1 msg/s) считаются
+    token bucket'ами в Redis, поэтому их делят все воркеры celery и gunicorn.
+    """
+
+    prefix = "telegram:ratelimit"
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        *,
+        global_rate: float,
+        chat_rate: float,
+        global_burst: float | None = None,
+        chat_burst: float | None = None,
+    ):
+        self.client = client
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.global_burst = global_burst or global_rate
+        self.chat_burst = chat_burst or max(chat_rate, 1)
+        self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, chat_id: int) -> float:
+        """Списать токен; вернуть 0 или время ожидания в секундах."""
+        wait_ms = self._script(
+            keys=(
+                f"{self.prefix}:global",
+                f"{self.prefix}:chat:{chat_id}",
+                f"{self.prefix}:pause",
+            ),
+            args=(
+                self.global_rate,
+                self.global_burst,
+                self.chat_rate,
+                self.chat_burst,
+            ),
+        )
+        return int(wait_ms) / 1000
+
+    def pause(self, seconds: float) -> None:
+        """Остановить все отправки на ``retry_after`` секунд после 429."""
+        self.client.set(
+            f"{self.prefix}:pause", 1, px=max(1, math.ceil(seconds * 1000))
+        )
+
+
+class LocalRateLimiter:
+    """Тот же token bucket в памяти процесса (без Redis, для тестов/dev)."""
+
+    def __init__(
+        self,
+        *,
+        global_rate: float,
+        chat_rate: float,
+        global_burst: float | None = None,
+        chat_burst: float | None = None,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.global_burst = global_burst or global_rate
+        self.chat_burst = chat_burst or max(chat_rate, 1)
+        self._buckets: dict[object, tuple[float, float]] = {}
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, key: object, rate: float, burst: float, now: float) -> float:
+        tokens, ts = self._buckets.get(key, (burst, now))
+        return min(burst, tokens + (now - ts) * rate)
+
+    def acquire(self, chat_id: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                return self._paused_until - now
+            g = self._refill("global", self.global_rate, self.global_burst, now)
+            c = self._refill(chat_id, self.chat_rate, self.chat_burst, now)
+            if g < 1 or c < 1:
+                wait = 0.0
+                if g < 1:
+                    wait = (1 - g) / self.global_rate
+                if c < 1:
+                    wait = max(wait, (1 - c) / self.chat_rate)
+                return wait
+            self._buckets["global"] = (g - 1, now)
+            self._buckets[chat_id] = (c - 1, now)
+            return 0.0
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_rate_limiters: dict[int, RedisRateLimiter | LocalRateLimiter] = {}
+
+
+def get_rate_limiter() -> RedisRateLimiter | LocalRateLimiter | None:
+    """Лимитер отправки для текущего процесса (None, если выключен)."""
+    if not settings.TELEGRAM_RATE_LIMIT_ENABLED:
+        return None
+    pid = os.getpid()
+    limiter = _rate_limiters.get(pid)
+    if limiter is None:
+        options = {
+            "global_rate": settings.TELEGRAM_RATE_LIMIT_GLOBAL,
+            "chat_rate": settings.TELEGRAM_RATE_LIMIT_PER_CHAT,
+        }
+        client = get_redis()
+        if client is not None:
+            limiter = RedisRateLimiter(client, **options)
+        else:
+            limiter = LocalRateLimiter(**options)
+        _rate_limiters[pid] = limiter
+    return limiter
+
+
+class TelegramClient:
+    """Клиент Bot API с постоянным пулом keep-alive соединений.
+
+    Один экземпляр на процесс и токен (см. ``get_telegram_client``), поэтому
+    TCP+TLS рукопожатие с api.telegram.org выполняется один раз, а не на
+    каждое сообщение.
+    """
+
+    def __init__(
+        self, token: str, *, pool_size: int | None = None, timeout: float = 10
+    ):
+        self.token = token
+        self.timeout = timeout
+        self.pool_size = pool_size or settings.TELEGRAM_HTTP_POOL_SIZE
+        self.api_url = settings.TELEGRAM_API_URL.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, pool_block=True
+        )
+        # http:// — для локального Bot API сервера и заглушки в бенчмарках.
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(
+        self,
+        method: str,
+        payload: dict[str, Any] | None = None,
+        *,
+        timeout: float | None = None,
+    ) -> dict[str, Any]:
+        """Вызвать метод Bot API и вернуть разобранный ответ."""
+        response = self.session.post(
+            f"{self.api_url}/bot{self.token}/{method}",
+            json=payload or {},
+            timeout=timeout or self.timeout,
+        )
+        data = response.json()
+        if not response.ok or not data.get("ok", False):
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            if retry_after is not None:
+                limiter = get_rate_limiter()
+                if limiter is not None:
+                    limiter.pause(retry_after)
+                raise TelegramRetryAfter(
+                    f"Telegram API error: {data}", retry_after=retry_after
+                )
+            raise TelegramError(
+                f"Telegram API error: {data}", error_code=data.get("error_code")
+            )
+        return data
+
+    def throttle(self, chat_id: int) -> None:
+        """Дождаться свободного слота в лимитере перед отправкой в чат.
+
+        Если ждать дольше ``TELEGRAM_RATE_LIMIT_MAX_WAIT``, сообщение не
+        отправляется, а поднимается ``TelegramRetryAfter`` — вызывающий код
+        ставит его в очередь повторно, не занимая поток.
+        """
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return
+        waited = 0.0
+        while (wait := limiter.acquire(chat_id)) > 0:
+            if waited + wait > settings.TELEGRAM_RATE_LIMIT_MAX_WAIT:
+                raise TelegramRetryAfter(
+                    f"Rate limit for chat {chat_id}", retry_after=wait
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        reply_markup: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        payload: dict[str, Any] = {"chat_id": chat_id, "text": text}
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup
+        self.throttle(chat_id)
+        return self.call("sendMessage", payload)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: dict[tuple[int, str], TelegramClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_telegram_client(token: str) -> TelegramClient:
+    """Общий для процесса клиент для указанного токена.
+
+    Ключ включает PID: после fork (воркеры celery/gunicorn) дочерний процесс
+    заводит собственный пул, а не делит сокеты с родителем.
+    """
+    key = (os.getpid(), token)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = TelegramClient(
+                    token, timeout=settings.TELEGRAM_HTTP_TIMEOUT
+                )
+                _clients[key] = client
+    return client
 
 
 def send_telegram_message(*, token: str, chat_id: int, text: str) -> dict[str, Any]:
-    response = requests.post(
-        f"https://api.telegram.org/bot{token}/sendMessage",
-        json={"chat_id": chat_id, "text": text},
-        timeout=10,
-    )
-    data = response.json()
-    if not response.ok or not data.get("ok", False):
-        raise TelegramError(f"Telegram API error: {data}")
-    return data
+    return get_telegram_client(token).send_message(chat_id, text)
 
 
 def send_telegram_keyboard(
     *, token: str, chat_id: int, text: str, keyboard: list[list[dict[str, str]]]
 ) -> dict[str, Any]:
     """Отправить сообщение с inline клавиатурой."""
-    reply_markup = {"inline_keyboard": keyboard}
-    response = requests.post(
-        f"https://api.telegram.org/bot{token}/sendMessage",
-        json={
-            "chat_id": chat_id,
-            "text": text,
-            "reply_markup": reply_markup,
-        },
-        timeout=10,
+    return get_telegram_client(token).send_message(
+        chat_id, text, reply_markup={"inline_keyboard": keyboard}
     )
-    data = response.json()
-    if not response.ok or not data.get("ok", False):
-        raise TelegramError(f"Telegram API error: {data}")
-    return data
+
+
+def send_telegram_messages(
+    *,
+    token: str,
+    messages: Sequence[tuple[Hashable, int, str]],
+    concurrency: int | None = None,
+) -> dict[Hashable, Exception | None]:
+    """Отправить пачку сообщений параллельно с ограничением in-flight.
+
+    ``messages`` — кортежи ``(key, chat_id, text)``. Возвращает словарь
+    ``key -> None`` для доставленных и ``key -> исключение`` для остальных,
+    чтобы вызывающий код отметил только реально отправленные сообщения.
+    """
+    if not messages:
+        return {}
+    client = get_telegram_client(token)
+    # requests блокирующий, поэтому сообщения уходят из пула потоков. Потоков
+    # не больше, чем соединений в пуле клиента: при pool_block=True лишние
+    # только ждали бы свободного соединения.
+    limit = min(
+        concurrency or settings.TELEGRAM_SEND_CONCURRENCY,
+        client.pool_size,
+        len(messages),
+    )
+
+    def _send_one(message: tuple[Hashable, int, str]):
+        key, chat_id, text = message
+        try:
+            client.send_message(chat_id, text)
+        except (TelegramError, requests.RequestException) as exc:
+            return key, exc
+        return key, None
+
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        return dict(executor.map(_send_one, messages))
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .chat_users import forget_chats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, instance, **kwargs) -> None:
+    # Любое сохранение с новым chat_id: /start, /register, API, админка.
+    previous = getattr(instance, "_loaded_telegram_chat_id", None)
+    current = instance.__dict__.get("telegram_chat_id")
+    instance._loaded_telegram_chat_id = current
+    if current != previous:
+        # После коммита: иначе параллельный запрос успеет закешировать
+        # старую привязку заново.
+        transaction.on_commit(lambda: forget_chats(previous, current))
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs) -> None:
+    chat_id = instance.telegram_chat_id
+    if chat_id is not None:
+        transaction.on_commit(lambda: forget_chats(chat_id))
@@ -0,0 +1,106 @@
+"""Хранилище состояния диалогов бота (пошаговое создание привычки).
+
+Состояние — плоский словарь строк (``flow``, ``step``, ``user_id`` и
+введённые значения), без живых объектов моделей. В проде оно лежит в
+Redis-хеше с TTL и поэтому переживает перезапуски и переходы сообщений
+между воркерами gunicorn/celery. Без Redis используется LRU в памяти
+процесса с тем же TTL.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+
+from .services import get_redis
+
+State = dict[str, str]
+
+
+class RedisStateStore:
+    prefix = "telegram:state"
+
+    def __init__(self, client: redis.Redis, *, ttl: int):
+        self.client = client
+        self.ttl = ttl
+
+    def _key(self, chat_id: int) -> str:
+        return f"{self.prefix}:{chat_id}"
+
+    def get(self, chat_id: int) -> State | None:
+        data = self.client.hgetall(self._key(chat_id))
+        if not data:
+            return None
+        return {key.decode(): value.decode() for key, value in data.items()}
+
+    def set(self, chat_id: int, state: State) -> None:
+        key = self._key(chat_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=state)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, chat_id: int) -> None:
+        self.client.delete(self._key(chat_id))
+
+
+class MemoryStateStore:
+    """LRU с TTL в памяти процесса: брошенные диалоги не копятся вечно."""
+
+    def __init__(self, *, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[int, tuple[float, State]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> State | None:
+        with self._lock:
+            item = self._data.get(chat_id)
+            if item is None:
+                return None
+            expires_at, state = item
+            if expires_at <= time.monotonic():
+                del self._data[chat_id]
+                return None
+            self._data.move_to_end(chat_id)
+            return dict(state)
+
+    def set(self, chat_id: int, state: State) -> None:
+        with self._lock:
+            self._data[chat_id] = (time.monotonic() + self.ttl, dict(state))
+            self._data.move_to_end(chat_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, chat_id: int) -> None:
+        with self._lock:
+            self._data.pop(chat_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_stores: dict[str, RedisStateStore | MemoryStateStore] = {}
+
+
+def get_state_store() -> RedisStateStore | MemoryStateStore:
+    """Хранилище состояний для текущего процесса."""
+    client = get_redis()
+    backend = "redis" if client is not None else "memory"
+    store = _stores.get(backend)
+    if store is None:
+        if client is not None:
+            store = RedisStateStore(client, ttl=settings.TELEGRAM_STATE_TTL)
+        else:
+            store = MemoryStateStore(
+                ttl=settings.TELEGRAM_STATE_TTL,
+                maxsize=settings.TELEGRAM_STATE_MEMORY_SIZE,
+            )
+        _stores[backend] = store
+    return store
@@ -1,70 +1,299 @@
 from __future__ import annotations
 
+import datetime as dt
+import math
 import os
+import random
 
-from celery import shared_task
+import requests
+
+from celery import chord, shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils import timezone
 
 from habits.models import Habit
 
-from .services import TelegramError, send_telegram_message
+from . import queries
+from .bot_handler import extract_message, get_bot_handler
+from .messages import render_reminder
+from .models import ReminderDeadLetter
+from .services import (
+    TelegramError,
+    TelegramRetryAfter,
+    send_telegram_message,
+    send_telegram_messages,
+)
 
 User = get_user_model()
 
-
-def _build_text(habit: Habit) -> str:
-    reward = habit.reward
-    if habit.related_habit:
-        reward = f"Приятная привычка: {habit.related_habit.action}"
-    if reward:
-        reward = f"\nНаграда: {reward}"
-    return (
-        f"Напоминание о привычке:\n"
-        f"Действие: {habit.action}\n"
-        f"Место: {habit.place}\n"
-        f"Время: {habit.time.strftime('%H:%M')}{reward}"
-    )
+# Ошибки, которые повтор не исправит: бот заблокирован, чат не найден и т.п.
+PERMANENT_ERROR_CODES = frozenset({400, 403})
 
 
 @shared_task
 def send_habits_reminders() -> int:
+    """Диспетчер рассылки: раскладывает due-привычки по шардам.
+
+    Сам ничего не отправляет: выбирает ID по индексу ``next_reminder_at``,
+    «захватывает» их (переносит ``next_reminder_at`` на время аренды, чтобы
+    следующий тик не взял их повторно), режет на диапазоны ID и ставит
+    ``send_reminders_shard`` в очередь через chord. Итоговые счётчики
+    собирает ``collect_reminders_results``. Возвращает число привычек,
+    отправленных в рассылку.
+    """
     token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
     if not token:
         return 0
 
-    now = timezone.localtime(timezone.now())
-    today = now.date()
-    sent = 0
+    now = timezone.now()
+    # Индексированная выборка по next_reminder_at: пропущенные из-за простоя
+    # воркера минуты догоняются на ближайшем тике. Сортируем уже в Python:
+    # ORDER BY pk в запросе толкает планировщик к полному обходу по pk.
+    due_ids = sorted(
+        Habit.objects.filter(next_reminder_at__lte=now)
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+    if not due_ids:
+        return 0
+
+    shard_size = settings.TELEGRAM_REMINDER_SHARD_SIZE
+    shards = [due_ids[i : i + shard_size] for i in range(0, len(due_ids), shard_size)]
+
+    lease_until = now + dt.timedelta(seconds=settings.TELEGRAM_REMINDER_LEASE_SECONDS)
+    with transaction.atomic():
+        for shard in shards:
+            Habit.objects.filter(pk__in=shard).update(next_reminder_at=lease_until)
+
+    chord(
+        send_reminders_shard.s(shard, lease_until.isoformat()) for shard in shards
+    )(collect_reminders_results.s())
+    return len(due_ids)
+
+
+@shared_task
+def send_reminders_shard(
+    habit_ids: list[int], lease_until: str | None = None
+) -> dict[str, int]:
+    """Отправить напоминания для одного шарда привычек.
+
+    ``lease_until`` — метка аренды, выставленная диспетчером. Шард берёт
+    только привычки, которые её всё ещё несут: если очередь разбиралась
+    дольше аренды и следующий тик уже забрал привычку, она отправится там,
+    а не дважды.
+    """
+    result = {"sent": 0, "failed": 0, "skipped": 0, "requeued": 0}
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+    if not token:
+        result["failed"] = len(habit_ids)
+        return result
+
+    now = timezone.now()
+    # Изменённые привычки копим и пишем пачками в конце, а не по одному
+    # UPDATE (и транзакции) на каждое отправленное напоминание.
+    to_update: list[Habit] = []
 
-    habits = (
-        Habit.objects.select_related("related_habit", "user")
-        .filter(user__telegram_chat_id__isnull=False)
-        .all()
+    habits = queries.habits_by_ids(
+        habit_ids,
+        lease_until=(
+            dt.datetime.fromisoformat(lease_until) if lease_until is not None else None
+        ),
     )
 
+    pending: dict[int, Habit] = {}
     for habit in habits:
-        if habit.time.hour != now.time().hour or habit.time.minute != now.time().minute:
+        if habit.user.telegram_chat_id is None:
+            # Пользователь без Telegram: просто переносим расписание дальше.
+            habit.schedule_next_reminder(now + dt.timedelta(minutes=1))
+            to_update.append(habit)
+            result["skipped"] += 1
             continue
+        pending[habit.pk] = habit
+
+    delivery = send_telegram_messages(
+        token=token,
+        messages=[
+            (habit.pk, int(habit.user.telegram_chat_id), render_reminder(habit))
+            for habit in pending.values()
+        ],
+    )
 
-        if habit.last_reminded_at is not None:
-            last = timezone.localtime(habit.last_reminded_at).date()
-            if (today - last).days < habit.periodicity:
-                continue
-
-        try:
-            send_telegram_message(
-                token=token,
-                chat_id=int(habit.user.telegram_chat_id),
-                text=_build_text(habit),
-            )
-        except TelegramError:
-            # Чтобы задача не падала целиком из-за одного пользователя.
+    retry_ids: list[int] = []
+    retry_after = 0.0
+    for habit_id, error in delivery.items():
+        if isinstance(error, TelegramRetryAfter):
+            retry_ids.append(habit_id)
+            retry_after = max(retry_after, error.retry_after)
             continue
+        if error is not None:
+            # Не блокируем шард: повторы идут отдельной задачей с backoff.
+            _schedule_retry(pending[habit_id], attempt=1, error=error, now=now)
+            result["failed"] += 1
+            continue
+
+        habit = pending[habit_id]
+        habit.last_reminded_at = now
+        habit.schedule_next_reminder(now)
+        to_update.append(habit)
+        result["sent"] += 1
+
+    with transaction.atomic():
+        Habit.objects.bulk_update(
+            to_update,
+            ("last_reminded_at", "next_reminder_at"),
+            batch_size=settings.TELEGRAM_REMINDER_UPDATE_BATCH_SIZE,
+        )
+
+    if retry_ids:
+        # Упёрлись в лимит Telegram: переотправим эти привычки, когда
+        # истечёт retry_after, не дожидаясь конца аренды. Аренду продлеваем
+        # на это время, иначе их заберёт следующий тик диспетчера.
+        lease = now + dt.timedelta(
+            seconds=math.ceil(retry_after) + settings.TELEGRAM_REMINDER_LEASE_SECONDS
+        )
+        Habit.objects.filter(pk__in=retry_ids).update(next_reminder_at=lease)
+        send_reminders_shard.apply_async(
+            args=[retry_ids, lease.isoformat()], countdown=math.ceil(retry_after)
+        )
+        result["requeued"] = len(retry_ids)
+
+    return result
+
+
+@shared_task
+def retry_habit_reminder(
+    habit_id: int, attempt: int = 1, lease_until: str | None = None
+) -> bool:
+    """Повторная отправка одного напоминания (повтор номер ``attempt``).
+
+    Как и шард, отправляет только если привычка всё ещё под арендой
+    ``lease_until``.
+    """
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+    habit = queries.habit_by_id(habit_id)
+    if not token or habit is None or habit.user.telegram_chat_id is None:
+        return False
+    if (
+        lease_until is not None
+        and habit.next_reminder_at != dt.datetime.fromisoformat(lease_until)
+    ):
+        return False
+
+    now = timezone.now()
+    try:
+        send_telegram_message(
+            token=token,
+            chat_id=int(habit.user.telegram_chat_id),
+            text=render_reminder(habit),
+        )
+    except TelegramRetryAfter as exc:
+        # Лимит Telegram — не ошибка доставки, попытку не тратим.
+        lease = _extend_lease(habit.pk, now, exc.retry_after)
+        retry_habit_reminder.apply_async(
+            args=[habit.pk],
+            kwargs={"attempt": attempt, "lease_until": lease.isoformat()},
+            countdown=math.ceil(exc.retry_after),
+        )
+        return False
+    except (TelegramError, requests.RequestException) as exc:
+        _schedule_retry(habit, attempt=attempt + 1, error=exc, now=now)
+        return False
+
+    habit.last_reminded_at = now
+    habit.schedule_next_reminder(now)
+    Habit.objects.filter(pk=habit.pk).update(
+        last_reminded_at=habit.last_reminded_at,
+        next_reminder_at=habit.next_reminder_at,
+    )
+    return True
+
+
+def _retry_delay(attempt: int) -> float:
+    """Экспоненциальная задержка перед повтором ``attempt`` с jitter."""
+    base = settings.TELEGRAM_REMINDER_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    delay = min(settings.TELEGRAM_REMINDER_RETRY_MAX_DELAY, base)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _extend_lease(habit_id: int, now: dt.datetime, delay: float) -> dt.datetime:
+    # Держим привычку захваченной, пока идут повторы, чтобы диспетчер не
+    # отправил её параллельно по истечении исходной аренды.
+    lease = now + dt.timedelta(
+        seconds=delay + settings.TELEGRAM_REMINDER_LEASE_SECONDS
+    )
+    Habit.objects.filter(pk=habit_id).update(next_reminder_at=lease)
+    return lease
 
-        with transaction.atomic():
-            Habit.objects.filter(pk=habit.pk).update(last_reminded_at=now)
-        sent += 1
 
-    return sent
+def _schedule_retry(
+    habit: Habit, *, attempt: int, error: Exception, now: dt.datetime
+) -> None:
+    """Поставить повтор номер ``attempt`` в очередь или в dead letter.
+
+    Всего к этому моменту было ``attempt`` попыток отправки: исходная из
+    шарда и ``attempt - 1`` повторов.
+    """
+    error_code = getattr(error, "error_code", None)
+    permanent = error_code in PERMANENT_ERROR_CODES
+    if permanent or attempt > settings.TELEGRAM_REMINDER_RETRY_MAX_ATTEMPTS:
+        ReminderDeadLetter.objects.create(
+            habit=habit,
+            chat_id=habit.user.telegram_chat_id,
+            attempts=attempt,
+            error_code=error_code,
+            error=str(error),
+        )
+        # Это напоминание пропускаем, расписание идёт дальше.
+        habit.schedule_next_reminder(now + dt.timedelta(minutes=1))
+        Habit.objects.filter(pk=habit.pk).update(
+            next_reminder_at=habit.next_reminder_at
+        )
+        return
+
+    delay = _retry_delay(attempt)
+    lease = _extend_lease(habit.pk, now, delay)
+    retry_habit_reminder.apply_async(
+        args=[habit.pk],
+        kwargs={"attempt": attempt, "lease_until": lease.isoformat()},
+        countdown=delay,
+    )
+
+
+@shared_task
+def collect_reminders_results(results: list[dict[str, int]]) -> dict[str, int]:
+    """Сложить счётчики всех шардов одной рассылки."""
+    total = {
+        "shards": len(results),
+        "sent": 0,
+        "failed": 0,
+        "skipped": 0,
+        "requeued": 0,
+    }
+    for result in results:
+        for key in ("sent", "failed", "skipped", "requeued"):
+            total[key] += result.get(key, 0)
+    return total
+
+
+def update_queue(chat_id: int) -> str:
+    """Очередь, в которую попадают все обновления этого чата.
+
+    Обновления раскладываются по ``TELEGRAM_UPDATE_QUEUES`` очередям по
+    chat_id; каждую очередь разбирает ровно один процесс с concurrency=1,
+    поэтому сообщения одного чата обрабатываются строго по порядку, а разные
+    чаты — параллельно.
+    """
+    return f"telegram-updates-{chat_id % settings.TELEGRAM_UPDATE_QUEUES}"
+
+
+@shared_task
+def process_telegram_update(update: dict) -> bool:
+    """Обработать обновление Telegram, принятое webhook'ом."""
+    bot_handler = get_bot_handler()
+    message = extract_message(update)
+    if bot_handler is None or message is None:
+        return False
+    bot_handler.handle_message(*message)
+    return True
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from habits.models import Habit
+from telegram_bot import bot_handler
+from telegram_bot.bot_handler import BotHandler
+from telegram_bot.chat_users import get_chat_user_cache
+from telegram_bot.state import MemoryStateStore, get_state_store
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def _clear_states():
+    get_state_store().clear()
+    get_chat_user_cache().clear()
+    yield
+    get_state_store().clear()
+    get_chat_user_cache().clear()
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    outbox: list[dict] = []
+
+    def _send(**kwargs):
+        outbox.append(kwargs)
+        return {"ok": True}
+
+    monkeypatch.setattr(bot_handler, "send_telegram_message", _send)
+    monkeypatch.setattr(bot_handler, "send_telegram_keyboard", _send)
+    return outbox
+
+
+@pytest.mark.django_db
+def test_my_habits_uses_constant_number_of_queries(
+    sent, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="lister", telegram_chat_id=7001)
+    for i in range(5):
+        pleasant = Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(9, i),
+            action=f"pleasant {i}",
+            is_pleasant=True,
+            periodicity=1,
+            duration_seconds=60,
+        )
+        Habit.objects.create(
+            user=user,
+            place="park",
+            time=dt.time(8, i),
+            action=f"useful {i}",
+            related_habit=pleasant,
+            periodicity=1,
+            duration_seconds=60,
+        )
+
+    handler = BotHandler("token")
+    # Пользователь по chat_id + привычки вместе со связанными.
+    with django_assert_num_queries(2):
+        handler.handle_message(7001, "/my_habits", None)
+    # user_id чата уже в кеше.
+    with django_assert_num_queries(1):
+        handler.handle_message(7001, "/my_habits", None)
+
+    assert len(sent) == 2
+    assert "Награда: pleasant 4" in sent[0]["text"]
+
+
+@pytest.mark.django_db
+def test_start_skips_write_for_unchanged_chat_and_resets_cache(
+    sent, user_factory, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    user = user_factory(username="starter")
+    handler = BotHandler("token")
+
+    handler.handle_message(7003, "/my_habits", None)
+    assert sent[-1]["text"] == bot_handler.messages.NOT_REGISTERED
+
+    with django_capture_on_commit_callbacks(execute=True):
+        handler.handle_message(7003, "/start", "starter")
+    user.refresh_from_db()
+    assert user.telegram_chat_id == 7003
+
+    # Привязка уже такая же: только поиск пользователя, без UPDATE.
+    with django_assert_num_queries(1):
+        handler.handle_message(7003, "/start", "starter")
+
+    # Отрицательный ответ из кеша сброшен при привязке.
+    handler.handle_message(7003, "/my_habits", None)
+    assert sent[-1]["text"] == bot_handler.messages.HABITS_EMPTY
+
+
+@pytest.mark.django_db
+def test_chat_id_update_view_resets_cache(
+    auth_client, user_factory, django_capture_on_commit_callbacks
+):
+    user = user_factory(username="rebind", telegram_chat_id=7004)
+    cache = get_chat_user_cache()
+    assert cache.user_id(7004) == user.pk
+    assert cache.user_id(7005) is None
+
+    client = auth_client(user=user)
+    with django_capture_on_commit_callbacks(execute=True):
+        r = client.patch(
+            "/api/users/me/telegram/", {"telegram_chat_id": 7005}, format="json"
+        )
+
+    assert r.status_code == 200
+    assert cache.user_id(7004) is None
+    assert cache.user_id(7005) == user.pk
+
+
+@pytest.mark.django_db
+def test_create_habit_flow_survives_new_handler_per_message(sent, user_factory):
+    user = user_factory(username="creator", telegram_chat_id=7002)
+
+    steps = ["/create_habit", "выпить воды", "дома", "08:15", "60", "2"]
+    for text in steps:
+        # Как в webhook: новый обработчик на каждое сообщение.
+        BotHandler("token").handle_message(7002, text, None)
+
+    habit = Habit.objects.get(user=user)
+    assert habit.action == "выпить воды"
+    assert habit.place == "дома"
+    assert habit.time == dt.time(8, 15)
+    assert habit.duration_seconds == 60
+    assert habit.periodicity == 2
+    assert get_state_store().get(7002) is None
+    assert sent[-1]["text"].startswith("✅ Привычка создана!")
+
+
+def test_memory_state_store_is_bounded_and_expires(monkeypatch):
+    store = MemoryStateStore(ttl=10, maxsize=2)
+    store.set(1, {"step": "a"})
+    store.set(2, {"step": "b"})
+    store.set(3, {"step": "c"})
+
+    assert store.get(1) is None
+    assert store.get(3) == {"step": "c"}
+
+    import telegram_bot.state as state
+
+    now = state.time.monotonic()
+    monkeypatch.setattr(state.time, "monotonic", lambda: now + 11)
+    assert store.get(3) is None
+
+
+@pytest.mark.django_db
+def test_register_with_single_insert(
+    sent, settings, user_factory, django_assert_num_queries
+):
+    settings.TELEGRAM_BOT_TOKEN = "token"
+    handler = bot_handler.get_bot_handler()
+
+    # Без проверки exists(): сразу INSERT (в savepoint).
+    with django_assert_num_queries(3):
+        handler.handle_message(7006, "/register newbie secret123", None)
+
+    user = User.objects.get(username="newbie")
+    assert user.telegram_chat_id == 7006
+    assert user.check_password("secret123")
+    assert sent[-1]["text"].startswith("✅ Регистрация успешна!")
+
+
+@pytest.mark.django_db
+def test_command_after_register_sees_new_user(
+    sent, settings, django_capture_on_commit_callbacks
+):
+    settings.TELEGRAM_BOT_TOKEN = "token"
+    handler = bot_handler.get_bot_handler()
+
+    # До регистрации чат закеширован как «без пользователя».
+    handler.handle_message(7009, "/my_habits", None)
+    assert sent[-1]["text"] == bot_handler.messages.NOT_REGISTERED
+
+    with django_capture_on_commit_callbacks(execute=True):
+        handler.handle_message(7009, "/register fresh secret123", None)
+    handler.handle_message(7009, "/my_habits", None)
+    assert sent[-1]["text"] == bot_handler.messages.HABITS_EMPTY
+
+
+@pytest.mark.django_db
+def test_register_conflicts_are_reported_from_unique_constraint(
+    sent, settings, user_factory
+):
+    settings.TELEGRAM_BOT_TOKEN = "token"
+    user_factory(username="taken", telegram_chat_id=7007)
+    handler = bot_handler.get_bot_handler()
+
+    handler.handle_message(7008, "/register taken secret123", None)
+    assert sent[-1]["text"] == bot_handler.messages.REGISTER_EXISTS.format(
+        username="taken"
+    )
+
+    handler.handle_message(7007, "/register other secret123", None)
+    assert sent[-1]["text"] == bot_handler.messages.REGISTER_CHAT_TAKEN
+    assert not User.objects.filter(username="other").exists()
+
+
+@pytest.mark.django_db
+def test_chat_cache_follows_admin_rebind_and_user_delete(
+    user_factory, django_capture_on_commit_callbacks
+):
+    # Как в админке: пользователь загружен из БД и сохранён целиком.
+    user_factory(username="moved", telegram_chat_id=7010)
+    cache = get_chat_user_cache()
+    user = User.objects.get(username="moved")
+    assert cache.user_id(7010) == user.pk
+    assert cache.user_id(7011) is None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.telegram_chat_id = 7011
+        user.save()
+    assert cache.user_id(7010) is None
+    assert cache.user_id(7011) == user.pk
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.delete()
+    assert cache.user_id(7011) is None
@@ -3,6 +3,7 @@ from __future__ import annotations
 import datetime as dt
 
 import pytest
+from django.utils import timezone
 
 from habits.models import Habit
 
@@ -23,10 +24,105 @@ def test_habits_pagination_page_size_5(auth_client, user_factory):
 
     r = client.get("/api/habits/")
     assert r.status_code == 200
-    assert r.data["count"] == 6
+    assert "count" not in r.data
     assert len(r.data["results"]) == 5
     assert r.data["next"] is not None
 
+    r = client.get(r.data["next"])
+    assert r.status_code == 200
+    assert [h["action"] for h in r.data["results"]] == ["do 0"]
+    assert r.data["next"] is None
+
+
+@pytest.mark.django_db
+def test_habits_page_size_param_is_capped(
+    auth_client, user_factory, settings, django_assert_num_queries
+):
+    user = user_factory(username="sizer")
+    client = auth_client(user=user)
+    Habit.objects.bulk_create(
+        Habit(
+            user=user,
+            place="home",
+            time=dt.time(12, 0),
+            action=f"do {i}",
+            periodicity=1,
+            duration_seconds=60,
+        )
+        for i in range(8)
+    )
+
+    r = client.get("/api/habits/", {"page_size": 3})
+    assert len(r.data["results"]) == 3
+
+    r = client.get("/api/habits/", {"page_size": 1000})
+    assert len(r.data["results"]) == 8
+
+    # Последняя страница — тот же один запрос без COUNT(*) и OFFSET.
+    r = client.get("/api/habits/", {"page_size": 3})
+    r = client.get(r.data["next"])
+    with django_assert_num_queries(2) as ctx:
+        r = client.get(r.data["next"])
+    sql = " ".join(q["sql"] for q in ctx.captured_queries).upper()
+    assert "COUNT(" not in sql
+    assert "OFFSET" not in sql
+    assert [h["action"] for h in r.data["results"]] == ["do 1", "do 0"]
+
+
+@pytest.mark.django_db
+def test_habits_cursor_seeks_on_created_at_and_id(
+    auth_client, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="ties")
+    client = auth_client(user=user)
+    Habit.objects.bulk_create(
+        Habit(
+            user=user,
+            place="home",
+            time=dt.time(12, 0),
+            action=f"do {i}",
+            periodicity=1,
+            duration_seconds=60,
+        )
+        for i in range(7)
+    )
+    # Все привычки с одним created_at: страницы держатся только на id.
+    Habit.objects.update(created_at=timezone.now())
+    expected = [f"do {i}" for i in reversed(range(7))]
+
+    seen = []
+    url = "/api/habits/?page_size=2"
+    while url:
+        with django_assert_num_queries(2) as ctx:
+            r = client.get(url)
+        assert "OFFSET" not in " ".join(q["sql"] for q in ctx.captured_queries)
+        seen += [h["action"] for h in r.data["results"]]
+        last, url = r, r.data["next"]
+    assert seen == expected
+
+    back = []
+    url = last.data["previous"]
+    while url:
+        r = client.get(url)
+        back = [h["action"] for h in r.data["results"]] + back
+        url = r.data["previous"]
+    assert back == expected[:-1]
+
+
+@pytest.mark.django_db
+def test_habits_cursor_rejects_bad_position(auth_client, user_factory):
+    import base64
+
+    client = auth_client(user=user_factory(username="badcursor"))
+    for position in (
+        "2026-01-01T00:00:00+00:00",
+        "not-a-date|1",
+        "2026-01-01T00:00:00+00:00|x",
+    ):
+        cursor = base64.b64encode(f"p={position}".encode()).decode()
+        r = client.get("/api/habits/", {"cursor": cursor})
+        assert r.status_code == 404
+
 
 @pytest.mark.django_db
 def test_habit_crud_only_owner(auth_client, user_factory):
@@ -75,4 +171,126 @@ def test_public_habits_list_allow_any(api_client, user_factory):
     )
     r = api_client.get("/api/habits/public/")
     assert r.status_code == 200
-    assert r.data["count"] == 1
+    assert len(r.data["results"]) == 1
+
+
+@pytest.mark.django_db
+def test_habit_update_reschedules_next_reminder(auth_client, user_factory):
+    user = user_factory(username="sched")
+    client = auth_client(user=user)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(8, 0),
+        action="run",
+        periodicity=1,
+        duration_seconds=60,
+    )
+    before = habit.next_reminder_at
+    assert before is not None
+
+    r = client.patch(f"/api/habits/{habit.id}/", {"time": "09:15:00"}, format="json")
+    assert r.status_code == 200
+
+    habit.refresh_from_db()
+    assert habit.next_reminder_at.time() == dt.time(9, 15)
+    assert habit.next_reminder_at != before
+
+
+@pytest.mark.django_db
+def test_public_feed_is_cached_with_etag(
+    api_client,
+    user_factory,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    user = user_factory(username="feeder")
+    with django_capture_on_commit_callbacks(execute=True):
+        habit = Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(8, 0),
+            action="read",
+            periodicity=1,
+            duration_seconds=60,
+            is_public=True,
+        )
+
+    r = api_client.get("/api/habits/public/")
+    etag = r["ETag"]
+    assert r["Cache-Control"] == "public, max-age=30"
+
+    # Повтор берётся из кеша, с If-None-Match — 304 без тела.
+    with django_assert_num_queries(0):
+        assert api_client.get("/api/habits/public/").data == r.data
+        r304 = api_client.get("/api/habits/public/", HTTP_IF_NONE_MATCH=etag)
+    assert r304.status_code == 304
+    assert r304["ETag"] == etag
+
+    # Правка непубличного поля (или чужой приватной привычки) ленту не трогает.
+    with django_capture_on_commit_callbacks(execute=True):
+        habit.last_reminded_at = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+        habit.save()
+        Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(9, 0),
+            action="private",
+            periodicity=1,
+            duration_seconds=60,
+        )
+    assert api_client.get("/api/habits/public/")["ETag"] == etag
+
+    with django_capture_on_commit_callbacks(execute=True):
+        habit.action = "read a book"
+        habit.save()
+    r = api_client.get("/api/habits/public/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200
+    assert r["ETag"] != etag
+    assert r.data["results"][0]["action"] == "read a book"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        habit.is_public = False
+        habit.save()
+    assert api_client.get("/api/habits/public/").data["results"] == []
+
+
+@pytest.mark.django_db
+def test_public_feed_changes_when_related_habit_is_deleted(
+    api_client, user_factory, django_capture_on_commit_callbacks
+):
+    user = user_factory(username="linker")
+    with django_capture_on_commit_callbacks(execute=True):
+        pleasant = Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(20, 0),
+            action="bath",
+            periodicity=1,
+            duration_seconds=60,
+            is_pleasant=True,
+        )
+        Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(8, 0),
+            action="read",
+            periodicity=1,
+            duration_seconds=60,
+            is_public=True,
+            related_habit=pleasant,
+        )
+
+    r = api_client.get("/api/habits/public/")
+    etag = r["ETag"]
+    assert r.data["results"][0]["related_habit"] == pleasant.pk
+
+    # Приватная приятная привычка удаляется, у публичной related_habit
+    # обнуляется без save().
+    with django_capture_on_commit_callbacks(execute=True):
+        pleasant.delete()
+
+    r = api_client.get("/api/habits/public/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200
+    assert r["ETag"] != etag
+    assert r.data["results"][0]["related_habit"] is None
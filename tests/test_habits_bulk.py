@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+
+from habits.models import Habit
+
+
+def _habit(user, **kwargs) -> Habit:
+    data = {
+        "place": "home",
+        "time": dt.time(10, 0),
+        "action": "walk",
+        "periodicity": 1,
+        "duration_seconds": 60,
+    }
+    data.update(kwargs)
+    return Habit.objects.create(user=user, **data)
+
+
+def _payload(**kwargs) -> dict:
+    data = {
+        "place": "home",
+        "time": "11:00:00",
+        "action": "useful",
+        "periodicity": 1,
+        "duration_seconds": 60,
+    }
+    data.update(kwargs)
+    return data
+
+
+@pytest.mark.django_db
+def test_bulk_create_validates_batch_and_reports_per_item(
+    auth_client, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="bulk1")
+    other = user_factory(username="bulk2")
+    client = auth_client(user=user)
+    pleasant = _habit(user, action="bath", is_pleasant=True)
+    foreign = _habit(other, action="foreign", is_pleasant=True)
+
+    items = [_payload(action=f"do {i}", related_habit=pleasant.id) for i in range(5)]
+    items.append(_payload(related_habit=foreign.id))
+    items.append(_payload(duration_seconds=500))
+
+    # Пользователь, связанные привычки одним запросом, один INSERT
+    # (+ savepoint транзакции).
+    with django_assert_num_queries(5):
+        r = client.post("/api/habits/bulk/", items, format="json")
+
+    assert r.status_code == 200
+    results = r.data["results"]
+    assert [item["status"] for item in results] == [201] * 5 + [400, 400]
+    assert "related_habit" in results[5]["errors"]
+    assert "duration_seconds" in results[6]["errors"]
+
+    created = Habit.objects.filter(user=user, action__startswith="do ")
+    assert created.count() == 5
+    habit = created.get(pk=results[0]["data"]["id"])
+    assert habit.related_habit_id == pleasant.id
+    assert habit.next_reminder_at is not None
+    assert habit.created_at is not None
+
+
+@pytest.mark.django_db
+def test_bulk_update_writes_changed_fields_and_reschedules(
+    auth_client, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="bulk3")
+    other = user_factory(username="bulk4")
+    client = auth_client(user=user)
+    pleasant = _habit(user, action="bath", is_pleasant=True)
+    habits = [_habit(user, related_habit=pleasant) for _ in range(3)]
+    foreign = _habit(other)
+    before = {habit.pk: habit.next_reminder_at for habit in habits}
+    updated_before = habits[0].updated_at
+
+    items = [{"id": habit.pk, "time": "07:30:00"} for habit in habits]
+    items += [{"id": foreign.pk, "place": "x"}, {"id": habits[0].pk, "place": "y"}]
+    items.append({"id": pleasant.pk, "reward": "cake"})
+
+    # Пользователь, привычки, связанные привычки, UPDATE (+ savepoint).
+    with django_assert_num_queries(6):
+        r = client.patch("/api/habits/bulk/", items, format="json")
+
+    assert [item["status"] for item in r.data["results"]] == [
+        200,
+        200,
+        200,
+        404,
+        400,
+        400,
+    ]
+    for habit in habits:
+        habit.refresh_from_db()
+        assert habit.time == dt.time(7, 30)
+        assert habit.next_reminder_at != before[habit.pk]
+        assert habit.next_reminder_at.time() == dt.time(7, 30)
+    assert habits[0].updated_at > updated_before
+    foreign.refresh_from_db()
+    assert foreign.place == "home"
+
+
+@pytest.mark.django_db
+def test_bulk_delete_only_own_habits(auth_client, user_factory):
+    user = user_factory(username="bulk5")
+    other = user_factory(username="bulk6")
+    client = auth_client(user=user)
+    mine = [_habit(user) for _ in range(2)]
+    foreign = _habit(other)
+
+    r = client.delete(
+        "/api/habits/bulk/", [mine[0].pk, foreign.pk, mine[1].pk], format="json"
+    )
+
+    assert [item["status"] for item in r.data["results"]] == [204, 404, 204]
+    assert not Habit.objects.filter(user=user).exists()
+    assert Habit.objects.filter(pk=foreign.pk).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_rejects_non_integer_ids_per_item(auth_client, user_factory):
+    user = user_factory(username="bulk9")
+    client = auth_client(user=user)
+    habit = _habit(user)
+
+    r = client.patch(
+        "/api/habits/bulk/",
+        [
+            {"id": [habit.pk], "place": "x"},
+            {"id": True, "place": "x"},
+            {"id": str(habit.pk), "place": "x"},
+            {"place": "x"},
+            {"id": habit.pk, "place": "park"},
+        ],
+        format="json",
+    )
+    assert r.status_code == 200
+    assert [item["status"] for item in r.data["results"]] == [400, 400, 400, 400, 200]
+    assert r.data["results"][0]["errors"] == {"id": ["Ожидается целочисленный ID."]}
+
+    r = client.delete(
+        "/api/habits/bulk/", [True, [habit.pk], "1", habit.pk], format="json"
+    )
+    assert r.status_code == 200
+    assert [item["status"] for item in r.data["results"]] == [400, 400, 400, 204]
+    assert not Habit.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_accepts_related_habit_pk_as_string(auth_client, user_factory):
+    user = user_factory(username="bulk10")
+    client = auth_client(user=user)
+    pleasant = _habit(user, action="bath", is_pleasant=True)
+    payload = _payload(related_habit=str(pleasant.pk))
+
+    single = client.post("/api/habits/", payload, format="json")
+    r = client.post("/api/habits/bulk/", [payload], format="json")
+
+    assert single.status_code == 201
+    assert r.data["results"][0]["status"] == 201
+    assert r.data["results"][0]["data"]["related_habit"] == pleasant.pk
+
+
+@pytest.mark.django_db
+def test_bulk_batch_size_is_limited(auth_client, user_factory, settings):
+    settings.HABITS_BULK_MAX_BATCH_SIZE = 2
+    client = auth_client(user=user_factory(username="bulk7"))
+
+    r = client.post("/api/habits/bulk/", [_payload()] * 3, format="json")
+    assert r.status_code == 400
+    r = client.post("/api/habits/bulk/", {"action": "x"}, format="json")
+    assert r.status_code == 400
+    assert not Habit.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_write_bumps_public_feed(
+    api_client, auth_client, user_factory, django_capture_on_commit_callbacks
+):
+    user = user_factory(username="bulk8")
+    client = auth_client(user=user)
+    assert api_client.get("/api/habits/public/").data["results"] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        r = client.post(
+            "/api/habits/bulk/", [_payload(is_public=True)], format="json"
+        )
+    habit_id = r.data["results"][0]["data"]["id"]
+    assert [h["id"] for h in api_client.get("/api/habits/public/").data["results"]] == [
+        habit_id
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.patch(
+            "/api/habits/bulk/", [{"id": habit_id, "is_public": False}], format="json"
+        )
+    assert api_client.get("/api/habits/public/").data["results"] == []
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+
+from habits.models import Habit
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_hot_queries_use_indexes():
+    # Маленький набор, но планировщик SQLite уже выбирает индексы;
+    # полноценный замер: explain_habit_queries --seed-habits 1000000.
+    call_command(
+        "explain_habit_queries",
+        "--seed-users=50",
+        "--seed-habits=3000",
+        "--check",
+    )
+
+
+@pytest.mark.django_db
+def test_seed_habits_command():
+    call_command("seed_habits", "--users=20", "--habits=400", "--seed=1")
+
+    assert User.objects.count() == 20
+    assert Habit.objects.count() == 400
+    # Напоминания тяготеют к дневным часам, ночью их почти нет.
+    hours = Counter(habit.time.hour for habit in Habit.objects.all())
+    assert sum(hours[h] for h in range(7, 23)) > 10 * sum(hours[h] for h in range(5))
+    assert not Habit.objects.filter(next_reminder_at__isnull=True).exists()
+    assert User.objects.filter(telegram_chat_id__isnull=False).count() > 10
+
+
+@pytest.mark.django_db
+def test_seed_habits_command_rejects_bad_sizes():
+    with pytest.raises(CommandError):
+        call_command("seed_habits", "--users=0", "--habits=10")
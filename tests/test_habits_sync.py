@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+from django.utils import timezone
+
+from habits import sync
+from habits.models import Habit, HabitTombstone
+from habits.tasks import prune_habit_tombstones
+
+
+def _habit(user, **kwargs) -> Habit:
+    data = {
+        "place": "home",
+        "time": dt.time(10, 0),
+        "action": "walk",
+        "periodicity": 1,
+        "duration_seconds": 60,
+    }
+    data.update(kwargs)
+    return Habit.objects.create(user=user, **data)
+
+
+def _age(queryset, seconds: int) -> None:
+    queryset.update(updated_at=timezone.now() - dt.timedelta(seconds=seconds))
+
+
+@pytest.mark.django_db
+def test_changes_returns_only_delta_and_tombstones(
+    auth_client, user_factory, settings
+):
+    settings.HABITS_SYNC_OVERLAP_SECONDS = 0
+    user = user_factory(username="sync1")
+    other = user_factory(username="sync2")
+    client = auth_client(user=user)
+    pleasant = _habit(user, action="bath", is_pleasant=True)
+    useful = _habit(user, related_habit=pleasant)
+    untouched = _habit(user, action="read")
+    _habit(other)
+    _age(Habit.objects.all(), 60)
+
+    r = client.get("/api/habits/changes/")
+    assert r.status_code == 200
+    assert {h["id"] for h in r.data["changed"]} == {
+        pleasant.pk,
+        useful.pk,
+        untouched.pk,
+    }
+    assert r.data["deleted"] == []
+    token = r.data["since"]
+
+    r = client.get("/api/habits/changes/", {"since": token})
+    assert r.data["changed"] == []
+    assert r.data["deleted"] == []
+
+    # Удаление приятной привычки обнуляет ссылку у useful — это тоже
+    # изменение.
+    pleasant_id = pleasant.pk
+    pleasant.delete()
+    created = _habit(user, action="new")
+    r = client.get("/api/habits/changes/", {"since": token})
+    assert [h["id"] for h in r.data["changed"]] == [useful.pk, created.pk]
+    assert r.data["changed"][0]["related_habit"] is None
+    assert r.data["deleted"] == [pleasant_id]
+
+
+@pytest.mark.django_db
+def test_changes_rejects_bad_and_expired_watermarks(
+    auth_client, user_factory, settings
+):
+    client = auth_client(user=user_factory(username="sync3"))
+
+    assert client.get("/api/habits/changes/", {"since": "garbage"}).status_code == 400
+
+    old = timezone.now() - dt.timedelta(
+        days=settings.HABITS_TOMBSTONE_RETENTION_DAYS + 1
+    )
+    r = client.get("/api/habits/changes/", {"since": sync.encode_watermark(old)})
+    assert r.status_code == 410
+
+
+@pytest.mark.django_db
+def test_watermark_overlaps_recent_writes(auth_client, user_factory, settings):
+    settings.HABITS_SYNC_OVERLAP_SECONDS = 30
+    user = user_factory(username="sync4")
+    client = auth_client(user=user)
+    habit = _habit(user)
+
+    token = client.get("/api/habits/changes/").data["since"]
+    # Запись в окне перекрытия приходит повторно — клиент применяет по id.
+    r = client.get("/api/habits/changes/", {"since": token})
+    assert [h["id"] for h in r.data["changed"]] == [habit.pk]
+
+
+@pytest.mark.django_db
+def test_prune_habit_tombstones(user_factory, settings):
+    user = user_factory(username="sync5")
+    _habit(user).delete()
+    _habit(user).delete()
+    HabitTombstone.objects.filter(
+        pk=HabitTombstone.objects.order_by("pk").first().pk
+    ).update(
+        deleted_at=timezone.now()
+        - dt.timedelta(days=settings.HABITS_TOMBSTONE_RETENTION_DAYS + 1)
+    )
+
+    assert prune_habit_tombstones() == 1
+    assert HabitTombstone.objects.count() == 1
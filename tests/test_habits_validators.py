@@ -124,3 +124,90 @@ def test_periodicity_cannot_be_more_than_7_days(auth_client, user_factory):
         format="json",
     )
     assert r.status_code == 400
+
+
+@pytest.mark.django_db
+def test_related_habit_of_other_user_is_rejected(auth_client, user_factory):
+    owner = user_factory(username="v6")
+    other = user_factory(username="v7")
+    foreign = Habit.objects.create(
+        user=other,
+        place="home",
+        time=dt.time(10, 0),
+        action="foreign",
+        is_pleasant=True,
+        periodicity=1,
+        duration_seconds=60,
+    )
+    r = auth_client(user=owner).post(
+        "/api/habits/",
+        {
+            "place": "home",
+            "time": "11:00:00",
+            "action": "useful",
+            "related_habit": foreign.id,
+            "periodicity": 1,
+            "duration_seconds": 60,
+        },
+        format="json",
+    )
+    assert r.status_code == 400
+    assert "related_habit" in r.data
+
+
+@pytest.mark.django_db
+def test_habit_write_validates_in_one_pass(
+    auth_client, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="v8")
+    client = auth_client(user=user)
+    pleasant = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(10, 0),
+        action="bath",
+        is_pleasant=True,
+        periodicity=1,
+        duration_seconds=60,
+    )
+    payload = {
+        "place": "home",
+        "time": "11:00:00",
+        "action": "useful",
+        "related_habit": pleasant.id,
+        "periodicity": 1,
+        "duration_seconds": 60,
+    }
+
+    # Пользователь из токена, связанная привычка (один раз), INSERT.
+    with django_assert_num_queries(3):
+        r = client.post("/api/habits/", payload, format="json")
+    assert r.status_code == 201
+
+    habit = Habit.objects.get(pk=r.data["id"])
+    # Пользователь, привычка, связанная привычка, UPDATE.
+    with django_assert_num_queries(4):
+        r = client.patch(
+            f"/api/habits/{habit.id}/", {"place": "park"}, format="json"
+        )
+    assert r.status_code == 200
+
+
+@pytest.mark.django_db
+def test_failed_update_does_not_touch_instance(auth_client, user_factory):
+    user = user_factory(username="v9")
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(10, 0),
+        action="walk",
+        reward="tea",
+        periodicity=1,
+        duration_seconds=60,
+    )
+    r = auth_client(user=user).patch(
+        f"/api/habits/{habit.id}/", {"is_pleasant": True}, format="json"
+    )
+    assert r.status_code == 400
+    habit.refresh_from_db()
+    assert habit.is_pleasant is False
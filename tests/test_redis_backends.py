@@ -0,0 +1,155 @@
+"""Redis-реализации (лимитер, состояние диалогов, дедупликация, кеш чатов).
+
+В тестах ``REDIS_URL`` пуст и код идёт через in-memory варианты, поэтому
+Redis-ветки проверяются здесь отдельно на fakeredis (Lua-скрипты
+выполняются через lupa).
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from telegram_bot.chat_users import ChatUserCache
+from telegram_bot.dedup import RedisUpdateDeduplicator
+from telegram_bot.services import RedisRateLimiter
+from telegram_bot.state import RedisStateStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+# --- RedisRateLimiter (Lua token bucket) ---
+
+
+def test_rate_limiter_per_chat_wait_and_refill(redis_client):
+    limiter = RedisRateLimiter(
+        redis_client, global_rate=1000, chat_rate=20, chat_burst=1
+    )
+
+    assert limiter.acquire(1) == 0
+    wait = limiter.acquire(1)
+    assert 0 < wait <= 0.05
+    # Другой чат не ждёт: лимит на чат у каждого свой.
+    assert limiter.acquire(2) == 0
+
+    time.sleep(wait + 0.01)
+    assert limiter.acquire(1) == 0
+
+
+def test_rate_limiter_global_bucket(redis_client):
+    limiter = RedisRateLimiter(redis_client, global_rate=2, chat_rate=100)
+
+    assert limiter.acquire(1) == 0
+    assert limiter.acquire(2) == 0
+    wait = limiter.acquire(3)
+    assert 0 < wait <= 0.5
+
+
+def test_rate_limiter_is_shared_between_processes(redis_server):
+    first = RedisRateLimiter(
+        fakeredis.FakeRedis(server=redis_server), global_rate=1000, chat_rate=1
+    )
+    second = RedisRateLimiter(
+        fakeredis.FakeRedis(server=redis_server), global_rate=1000, chat_rate=1
+    )
+
+    assert first.acquire(7) == 0
+    assert second.acquire(7) > 0
+
+
+def test_rate_limiter_pause_blocks_all_chats(redis_client):
+    limiter = RedisRateLimiter(redis_client, global_rate=1000, chat_rate=1000)
+
+    limiter.pause(2)
+
+    assert 1.9 < limiter.acquire(1) <= 2
+    assert 1.9 < limiter.acquire(2) <= 2
+    assert 0 < redis_client.pttl(f"{limiter.prefix}:pause") <= 2000
+
+
+def test_rate_limiter_keys_expire(redis_client):
+    limiter = RedisRateLimiter(redis_client, global_rate=30, chat_rate=1)
+
+    limiter.acquire(5)
+
+    assert redis_client.pttl(f"{limiter.prefix}:global") > 0
+    assert redis_client.pttl(f"{limiter.prefix}:chat:5") > 0
+
+
+# --- RedisStateStore ---
+
+
+def test_state_store_roundtrip_with_ttl(redis_client):
+    store = RedisStateStore(redis_client, ttl=60)
+
+    store.set(1, {"step": "place", "action": "walk"})
+    store.set(1, {"step": "time"})
+
+    assert store.get(1) == {"step": "time"}
+    assert 0 < redis_client.ttl(store._key(1)) <= 60
+    store.delete(1)
+    assert store.get(1) is None
+
+
+# --- RedisUpdateDeduplicator ---
+
+
+def test_update_deduplicator_claims_once(redis_client):
+    deduplicator = RedisUpdateDeduplicator(redis_client, ttl=100)
+
+    assert deduplicator.claim(10)
+    assert not deduplicator.claim(10)
+    assert deduplicator.claim(9)
+    assert 0 < redis_client.ttl(f"{deduplicator.prefix}:10") <= 100
+    deduplicator.release(10)
+    assert deduplicator.claim(10)
+
+
+# --- ChatUserCache, уровень Redis ---
+
+
+def _cache(client) -> ChatUserCache:
+    return ChatUserCache(client, ttl=600, local_ttl=10, maxsize=100)
+
+
+@pytest.mark.django_db
+def test_chat_user_cache_shares_lookups_through_redis(
+    redis_server, user_factory, django_assert_num_queries
+):
+    user = user_factory(username="cached", telegram_chat_id=777)
+    first = _cache(fakeredis.FakeRedis(server=redis_server))
+    second = _cache(fakeredis.FakeRedis(server=redis_server))
+
+    with django_assert_num_queries(2):
+        assert first.user_id(777) == user.pk
+        assert first.user_id(778) is None
+    # Другой процесс берёт ответ (и отсутствие пользователя) из Redis.
+    with django_assert_num_queries(0):
+        assert second.user_id(777) == user.pk
+        assert second.user_id(778) is None
+
+
+@pytest.mark.django_db
+def test_chat_user_cache_forget_drops_redis_key(
+    redis_client, user_factory, django_assert_num_queries
+):
+    cache = _cache(redis_client)
+    assert cache.user_id(779) is None
+
+    user = user_factory(username="late", telegram_chat_id=779)
+    cache.forget(779)
+
+    assert not redis_client.exists(cache._key(779))
+    with django_assert_num_queries(1):
+        assert cache.user_id(779) == user.pk
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from django.core.management import call_command
+
+from telegram_bot import bot_handler
+from telegram_bot.dedup import get_update_deduplicator
+from telegram_bot.management.commands import start_polling
+from telegram_bot.polling import ChatWorkerPool
+
+
+@pytest.fixture(autouse=True)
+def _clear_seen_updates():
+    get_update_deduplicator().clear()
+    yield
+    get_update_deduplicator().clear()
+
+
+def _update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"chat": {"id": chat_id}, "text": text},
+    }
+
+
+def test_pool_keeps_order_within_chat_and_runs_chats_in_parallel():
+    handled: list[tuple[int, str]] = []
+    slow_started = threading.Event()
+    release_slow = threading.Event()
+
+    def handle(update):
+        chat_id = update["message"]["chat"]["id"]
+        text = update["message"]["text"]
+        if text == "slow":
+            slow_started.set()
+            release_slow.wait(5)
+        handled.append((chat_id, text))
+
+    pool = ChatWorkerPool(2, handle)
+    pool.submit(0, _update(1, 0, "slow"))
+    pool.submit(0, _update(2, 0, "after slow"))
+    assert slow_started.wait(5)
+    pool.submit(1, _update(3, 1, "fast"))
+
+    deadline = time.monotonic() + 5
+    while (1, "fast") not in handled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Медленный чат не задерживает другой чат.
+    assert handled == [(1, "fast")]
+
+    release_slow.set()
+    pool.join()
+    pool.close()
+    assert handled == [(1, "fast"), (0, "slow"), (0, "after slow")]
+
+
+@pytest.mark.django_db
+def test_start_polling_processes_batches_and_advances_offset(settings, monkeypatch):
+    settings.TELEGRAM_BOT_TOKEN = "polling-token"
+    batches = [
+        [_update(10, 1, "/help"), _update(11, 2, "/help")],
+        [_update(12, 1, "hello")],
+        # Повторная доставка после «перезапуска»: уже обработано.
+        [_update(12, 1, "hello")],
+    ]
+    offsets: list[int] = []
+    handled: list[tuple[int, str]] = []
+
+    class FakeClient:
+        def call(self, method, payload, timeout=None):
+            offsets.append(payload["offset"])
+            if batches:
+                return {"ok": True, "result": batches.pop(0)}
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(
+        start_polling, "get_telegram_client", lambda token: FakeClient()
+    )
+    monkeypatch.setattr(
+        bot_handler.BotHandler,
+        "handle_message",
+        lambda self, chat_id, text, username: handled.append((chat_id, text)),
+    )
+
+    call_command("start_polling", "--workers", "2", "--timeout", "1")
+
+    assert offsets == [0, 12, 13, 13]
+    assert sorted(handled) == [(1, "/help"), (1, "hello"), (2, "/help")]
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+
+from habits.models import Habit
+from telegram_bot import messages
+
+
+@pytest.fixture(autouse=True)
+def _clear_render_cache():
+    messages.clear_render_cache()
+    yield
+    messages.clear_render_cache()
+
+
+@pytest.mark.django_db
+def test_render_reminder_text(user_factory):
+    user = user_factory(username="render")
+    pleasant = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(9, 0),
+        action="bath",
+        is_pleasant=True,
+        periodicity=1,
+        duration_seconds=60,
+    )
+    habit = Habit.objects.create(
+        user=user,
+        place="park",
+        time=dt.time(8, 5),
+        action="run",
+        related_habit=pleasant,
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    text = messages.render_reminder(habit)
+    assert text == (
+        "Напоминание о привычке:\n"
+        "Действие: run\n"
+        "Место: park\n"
+        "Время: 08:05\n"
+        "Награда: Приятная привычка: bath"
+    )
+
+    habit.place = "gym"
+    habit.save()
+    assert "Место: gym" in messages.render_reminder(habit)
+
+
+@pytest.mark.django_db
+def test_render_habit_list_caches_items(user_factory, monkeypatch):
+    user = user_factory(username="cacher")
+    habit = Habit.objects.create(
+        user=user,
+        place="park",
+        time=dt.time(8, 5),
+        action="run",
+        periodicity=1,
+        duration_seconds=60,
+    )
+    text = messages.render_habit_list([habit])
+
+    calls = []
+    original = messages._render_habit_item
+    monkeypatch.setattr(
+        messages, "_render_habit_item", lambda h: calls.append(h) or original(h)
+    )
+    assert messages.render_habit_list([habit]) == text
+    assert calls == []
+
+    habit.place = "gym"
+    habit.save()
+    assert "📍 gym" in messages.render_habit_list([habit])
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_render_habit_list_numbers_items(user_factory):
+    user = user_factory(username="lister")
+    habits = [
+        Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(7, i),
+            action=f"do {i}",
+            reward="tea" if i == 0 else "",
+            periodicity=2,
+            duration_seconds=30,
+        )
+        for i in range(2)
+    ]
+
+    text = messages.render_habit_list(habits)
+    assert text == (
+        "📋 Ваши привычки:\n\n"
+        "1. do 0\n   🕐 07:00\n   📍 home\n   ⏱ 30с\nНаграда: tea\n"
+        "   🔄 Каждые 2 дн.\n\n"
+        "2. do 1\n   🕐 07:01\n   📍 home\n   ⏱ 30с\n"
+        "   🔄 Каждые 2 дн.\n\n"
+    )
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from telegram_bot import services
+
+
+class _Resp:
+    ok = True
+
+    def json(self):
+        return {"ok": True, "result": {"message_id": 1}}
+
+
+class _FailResp:
+    ok = False
+
+    def json(self):
+        return {"ok": False, "error_code": 400, "description": "Bad Request"}
+
+
+def test_telegram_client_is_shared_per_token(settings):
+    settings.TELEGRAM_HTTP_POOL_SIZE = 4
+    client = services.get_telegram_client("shared-token")
+
+    assert services.get_telegram_client("shared-token") is client
+    assert services.get_telegram_client("other-token") is not client
+    adapter = client.session.get_adapter("https://api.telegram.org")
+    assert adapter._pool_maxsize == 4
+
+
+def test_send_telegram_keyboard_uses_pooled_session(monkeypatch):
+    calls = []
+
+    def _post(session, url, **kwargs):
+        calls.append((session, url, kwargs["json"]))
+        return _Resp()
+
+    monkeypatch.setattr(services.requests.Session, "post", _post)
+
+    services.send_telegram_message(token="pool-token", chat_id=1, text="a")
+    services.send_telegram_keyboard(
+        token="pool-token",
+        chat_id=1,
+        text="b",
+        keyboard=[[{"text": "x", "callback_data": "y"}]],
+    )
+
+    assert calls[0][0] is calls[1][0]
+    assert calls[0][1].endswith("/botpool-token/sendMessage")
+    assert calls[1][2]["reply_markup"] == {
+        "inline_keyboard": [[{"text": "x", "callback_data": "y"}]]
+    }
+
+
+def test_send_telegram_messages_bounded_concurrency(monkeypatch):
+    import threading
+    import time
+
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def _post(session, url, **kwargs):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.02)
+        with lock:
+            in_flight["now"] -= 1
+        if kwargs["json"]["chat_id"] == 3:
+            return _FailResp()
+        return _Resp()
+
+    monkeypatch.setattr(services.requests.Session, "post", _post)
+
+    results = services.send_telegram_messages(
+        token="batch-token",
+        messages=[(i, i, f"text {i}") for i in range(10)],
+        concurrency=3,
+    )
+
+    assert 1 < in_flight["max"] <= 3
+    assert isinstance(results.pop(3), services.TelegramError)
+    assert set(results) == set(range(10)) - {3}
+    assert all(error is None for error in results.values())
+
+
+def test_send_telegram_messages_capped_by_connection_pool(monkeypatch, settings):
+    import threading
+    import time
+
+    settings.TELEGRAM_HTTP_POOL_SIZE = 2
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def _post(session, url, **kwargs):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.02)
+        with lock:
+            in_flight["now"] -= 1
+        return _Resp()
+
+    monkeypatch.setattr(services.requests.Session, "post", _post)
+
+    results = services.send_telegram_messages(
+        token="small-pool-token",
+        messages=[(i, i, f"text {i}") for i in range(6)],
+        concurrency=8,
+    )
+
+    assert in_flight["max"] == 2
+    assert results == dict.fromkeys(range(6))
+
+
+def test_local_rate_limiter_enforces_chat_and_global_limits():
+    limiter = services.LocalRateLimiter(global_rate=2, chat_rate=1)
+
+    assert limiter.acquire(1) == 0
+    # Второе сообщение в тот же чат — ждать ~1 с.
+    assert 0 < limiter.acquire(1) <= 1
+    assert limiter.acquire(2) == 0
+    # Глобальный бюджет (2 в секунду) исчерпан даже для нового чата.
+    assert limiter.acquire(3) > 0
+
+    limiter.pause(10)
+    assert limiter.acquire(4) > 5
+
+
+def test_client_raises_retry_after_and_pauses_limiter(monkeypatch, settings):
+    settings.TELEGRAM_RATE_LIMIT_ENABLED = True
+    limiter = services.LocalRateLimiter(global_rate=30, chat_rate=1)
+    monkeypatch.setattr(services, "get_rate_limiter", lambda: limiter)
+
+    class _TooMany:
+        ok = False
+
+        def json(self):
+            return {
+                "ok": False,
+                "error_code": 429,
+                "parameters": {"retry_after": 7},
+            }
+
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _TooMany())
+
+    try:
+        services.send_telegram_message(token="limited-token", chat_id=5, text="x")
+    except services.TelegramRetryAfter as exc:
+        assert exc.retry_after == 7
+    else:
+        raise AssertionError("TelegramRetryAfter expected")
+
+    assert limiter.acquire(6) > 5
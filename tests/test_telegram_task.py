@@ -6,7 +6,11 @@ import pytest
 from django.utils import timezone
 
 from habits.models import Habit
-from telegram_bot.tasks import send_habits_reminders
+from telegram_bot.tasks import (
+    collect_reminders_results,
+    send_habits_reminders,
+    send_reminders_shard,
+)
 
 
 class _Resp:
@@ -25,6 +29,9 @@ def test_send_habits_reminders_sends_and_updates_timestamp(
     monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
     user = user_factory(username="tg", telegram_chat_id=123456)
 
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+
     habit = Habit.objects.create(
         user=user,
         place="home",
@@ -34,12 +41,9 @@ def test_send_habits_reminders_sends_and_updates_timestamp(
         duration_seconds=60,
     )
 
-    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
-    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
-
     import telegram_bot.services as services
 
-    monkeypatch.setattr(services.requests, "post", lambda *a, **k: _Resp())
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
 
     sent = send_habits_reminders()
     assert sent == 1
@@ -68,9 +72,376 @@ def test_send_habits_reminders_respects_periodicity(monkeypatch, user_factory):
 
     import telegram_bot.services as services
 
-    monkeypatch.setattr(services.requests, "post", lambda *a, **k: _Resp())
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
 
     sent = send_habits_reminders()
     assert sent == 0
     habit.refresh_from_db()
     assert habit.last_reminded_at.date() == dt.date(2026, 1, 1)
+
+
+@pytest.mark.django_db
+def test_send_habits_reminders_selects_only_due_minute(monkeypatch, user_factory):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="tg3", telegram_chat_id=123458)
+
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 8, 12, 30, 45))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+
+    due = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=7,
+        duration_seconds=60,
+        last_reminded_at=timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0)),
+    )
+    Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 31),
+        action="read",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
+
+    sent = send_habits_reminders()
+    assert sent == 1
+    due.refresh_from_db()
+    assert due.last_reminded_at == fixed_now
+
+
+@pytest.mark.django_db
+def test_send_habits_reminders_catches_up_after_downtime(monkeypatch, user_factory):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="tg4", telegram_chat_id=123459)
+
+    created_at = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 0, 0))
+    monkeypatch.setattr(timezone, "now", lambda: created_at)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=2,
+        duration_seconds=60,
+    )
+    assert habit.next_reminder_at == timezone.make_aware(
+        dt.datetime(2026, 1, 1, 12, 30)
+    )
+
+    # Воркер «проспал» нужную минуту и поднялся только в 12:34.
+    late = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 34, 10))
+    monkeypatch.setattr(timezone, "now", lambda: late)
+
+    import telegram_bot.services as services
+
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
+
+    assert send_habits_reminders() == 1
+    assert send_habits_reminders() == 0
+
+    habit.refresh_from_db()
+    assert habit.last_reminded_at == late
+    assert habit.next_reminder_at == timezone.make_aware(
+        dt.datetime(2026, 1, 3, 12, 30)
+    )
+
+
+@pytest.mark.django_db
+def test_send_habits_reminders_updates_timestamps_in_batches(
+    monkeypatch, settings, user_factory
+):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    settings.TELEGRAM_REMINDER_UPDATE_BATCH_SIZE = 2
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+
+    for i in range(3):
+        user = user_factory(username=f"batch{i}", telegram_chat_id=200000 + i)
+        Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(12, 30),
+            action="walk",
+            periodicity=1,
+            duration_seconds=60,
+        )
+
+    import telegram_bot.services as services
+
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert send_habits_reminders() == 3
+
+    # Один UPDATE захвата шарда диспетчером + пачки bulk_update (CASE WHEN).
+    updates = [
+        q
+        for q in ctx.captured_queries
+        if q["sql"].startswith("UPDATE") and "CASE WHEN" in q["sql"]
+    ]
+    assert len(updates) == 2
+    assert Habit.objects.filter(last_reminded_at=fixed_now).count() == 3
+
+
+@pytest.mark.django_db
+def test_send_habits_reminders_fans_out_into_shards(
+    monkeypatch, settings, user_factory
+):
+    settings.TELEGRAM_REMINDER_SHARD_SIZE = 2
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+
+    for i in range(5):
+        user = user_factory(username=f"shard{i}", telegram_chat_id=300000 + i)
+        Habit.objects.create(
+            user=user,
+            place="home",
+            time=dt.time(12, 30),
+            action="walk",
+            periodicity=1,
+            duration_seconds=60,
+        )
+
+    shards = []
+    original = send_reminders_shard.run
+
+    def _spy(habit_ids, lease_until=None):
+        shards.append(list(habit_ids))
+        return original(habit_ids, lease_until)
+
+    monkeypatch.setattr(send_reminders_shard, "run", _spy)
+
+    import telegram_bot.services as services
+
+    monkeypatch.setattr(services.requests.Session, "post", lambda *a, **k: _Resp())
+
+    assert send_habits_reminders() == 5
+    assert [len(shard) for shard in shards] == [2, 2, 1]
+    assert Habit.objects.filter(last_reminded_at=fixed_now).count() == 5
+
+
+def test_collect_reminders_results_sums_shards():
+    total = collect_reminders_results(
+        [
+            {"sent": 2, "failed": 0, "skipped": 1},
+            {"sent": 1, "failed": 1, "skipped": 0},
+        ]
+    )
+    assert total == {
+        "shards": 2,
+        "sent": 3,
+        "failed": 1,
+        "skipped": 1,
+        "requeued": 0,
+    }
+
+
+@pytest.mark.django_db
+def test_send_reminders_shard_requeues_on_retry_after(monkeypatch, user_factory):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="limited", telegram_chat_id=400000)
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    monkeypatch.setattr(
+        services.requests.Session,
+        "post",
+        lambda *a, **k: _Resp(
+            ok=False,
+            data={"ok": False, "error_code": 429, "parameters": {"retry_after": 3}},
+        ),
+    )
+    requeued = []
+    monkeypatch.setattr(
+        send_reminders_shard,
+        "apply_async",
+        lambda args, countdown: requeued.append((args, countdown)),
+    )
+
+    result = send_reminders_shard([habit.pk])
+
+    assert result["requeued"] == 1
+    # Аренда продлена на retry_after, повтор несёт новую метку.
+    habit.refresh_from_db()
+    lease = fixed_now + dt.timedelta(seconds=3 + 300)
+    assert habit.next_reminder_at == lease
+    assert requeued == [([[habit.pk], lease.isoformat()], 3)]
+    assert habit.last_reminded_at is None
+
+
+@pytest.mark.django_db
+def test_shard_skips_habits_redispatched_after_lease_expired(
+    monkeypatch, user_factory
+):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="slowq", telegram_chat_id=400001)
+    first_tick = timezone.make_aware(dt.datetime(2026, 1, 1, 8, 0, 0))
+    now = {"value": first_tick}
+    monkeypatch.setattr(timezone, "now", lambda: now["value"])
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(8, 0),
+        action="walk",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    sent = []
+    monkeypatch.setattr(
+        services.requests.Session,
+        "post",
+        lambda *a, **k: sent.append(k["json"]["chat_id"]) or _Resp(),
+    )
+    # Очередь забита: шарды только копятся, а не выполняются сразу.
+    import telegram_bot.tasks as tasks
+
+    queued = []
+    monkeypatch.setattr(
+        tasks, "chord", lambda header: queued.extend(header) or (lambda body: None)
+    )
+
+    assert send_habits_reminders() == 1
+    now["value"] = first_tick + dt.timedelta(minutes=6)  # аренда (300 с) истекла
+    assert send_habits_reminders() == 1
+
+    results = [send_reminders_shard(*signature.args) for signature in queued]
+
+    assert len(queued) == 2
+    assert sent == [400001]
+    assert [result["sent"] for result in results] == [0, 1]
+    habit.refresh_from_db()
+    assert habit.last_reminded_at == now["value"]
+
+
+@pytest.mark.django_db
+def test_failed_reminder_is_retried_then_dead_lettered(
+    monkeypatch, settings, user_factory
+):
+    from telegram_bot.models import ReminderDeadLetter
+
+    settings.TELEGRAM_REMINDER_RETRY_MAX_ATTEMPTS = 2
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="flaky", telegram_chat_id=500000)
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    calls = []
+
+    def _post(*a, **k):
+        calls.append(1)
+        return _Resp(ok=False, data={"ok": False, "error_code": 502})
+
+    monkeypatch.setattr(services.requests.Session, "post", _post)
+
+    # В eager-режиме повторы выполняются сразу, без задержек.
+    result = send_reminders_shard([habit.pk])
+
+    assert result["failed"] == 1
+    assert len(calls) == 3
+    dead = ReminderDeadLetter.objects.get()
+    assert dead.habit == habit
+    assert dead.attempts == 3
+    assert dead.error_code == 502
+    habit.refresh_from_db()
+    assert habit.last_reminded_at is None
+    assert habit.next_reminder_at == timezone.make_aware(
+        dt.datetime(2026, 1, 2, 12, 30)
+    )
+
+
+@pytest.mark.django_db
+def test_retry_succeeds_after_transient_error(monkeypatch, user_factory):
+    from telegram_bot.models import ReminderDeadLetter
+
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="blip", telegram_chat_id=500001)
+    fixed_now = timezone.make_aware(dt.datetime(2026, 1, 1, 12, 30, 0))
+    monkeypatch.setattr(timezone, "now", lambda: fixed_now)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    responses = [_Resp(ok=False, data={"ok": False, "error_code": 500}), _Resp()]
+    monkeypatch.setattr(
+        services.requests.Session, "post", lambda *a, **k: responses.pop(0)
+    )
+
+    send_reminders_shard([habit.pk])
+
+    habit.refresh_from_db()
+    assert habit.last_reminded_at == fixed_now
+    assert not ReminderDeadLetter.objects.exists()
+
+
+@pytest.mark.django_db
+def test_blocked_chat_goes_to_dead_letter_without_retries(monkeypatch, user_factory):
+    from telegram_bot.models import ReminderDeadLetter
+
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    user = user_factory(username="blocked", telegram_chat_id=500002)
+    habit = Habit.objects.create(
+        user=user,
+        place="home",
+        time=dt.time(12, 30),
+        action="walk",
+        periodicity=1,
+        duration_seconds=60,
+    )
+
+    import telegram_bot.services as services
+
+    calls = []
+
+    def _post(*a, **k):
+        calls.append(1)
+        return _Resp(ok=False, data={"ok": False, "error_code": 403})
+
+    monkeypatch.setattr(services.requests.Session, "post", _post)
+
+    send_reminders_shard([habit.pk])
+
+    assert len(calls) == 1
+    assert ReminderDeadLetter.objects.get().attempts == 1
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import pytest
+
+from telegram_bot import bot_handler
+from telegram_bot.bot_handler import get_bot_handler
+from telegram_bot.dedup import MemoryUpdateDeduplicator, get_update_deduplicator
+
+
+@pytest.fixture(autouse=True)
+def _clear_seen_updates():
+    get_update_deduplicator().clear()
+    yield
+    get_update_deduplicator().clear()
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    outbox: list[dict] = []
+
+    def _send(**kwargs):
+        outbox.append(kwargs)
+        return {"ok": True}
+
+    monkeypatch.setattr(bot_handler, "send_telegram_message", _send)
+    monkeypatch.setattr(bot_handler, "send_telegram_keyboard", _send)
+    return outbox
+
+
+def _update(chat_id: int, text: str, update_id: int = 1) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "chat": {"id": chat_id},
+            "from": {"username": "someone"},
+            "text": text,
+        },
+    }
+
+
+@pytest.mark.django_db
+def test_webhook_without_token_returns_500(api_client, settings):
+    settings.TELEGRAM_BOT_TOKEN = ""
+    r = api_client.post(
+        "/api/telegram/webhook/", _update(1, "/help"), format="json"
+    )
+    assert r.status_code == 500
+
+
+@pytest.mark.django_db
+def test_webhook_reuses_process_wide_handler(api_client, settings, sent):
+    settings.TELEGRAM_BOT_TOKEN = "webhook-token"
+
+    for update_id in (1, 2):
+        r = api_client.post(
+            "/api/telegram/webhook/",
+            _update(42, "/help", update_id),
+            format="json",
+        )
+        assert r.status_code == 200
+        assert r.json()["text"].startswith("📖")
+
+    assert get_bot_handler() is get_bot_handler()
+
+
+@pytest.mark.django_db
+def test_webhook_returns_single_reply_inline(api_client, settings, sent):
+    settings.TELEGRAM_BOT_TOKEN = "webhook-token"
+
+    r = api_client.post(
+        "/api/telegram/webhook/", _update(42, "hello"), format="json"
+    )
+
+    assert r.status_code == 200
+    assert r.json() == {
+        "method": "sendMessage",
+        "chat_id": 42,
+        "text": bot_handler.messages.UNKNOWN_COMMAND,
+    }
+    # Ответ ушёл в теле webhook'а, отдельного sendMessage не было.
+    assert sent == []
+
+
+def test_inline_falls_back_to_outbound_for_several_replies(sent):
+    handler = bot_handler.BotHandler(
+        "token", states=bot_handler.MemoryStateStore(ttl=60, maxsize=10)
+    )
+
+    def twice(chat_id, text, username):
+        handler._reply(chat_id, "one")
+        handler._reply(chat_id, "two")
+
+    handler.commands["/twice"] = twice
+
+    assert handler.handle_inline(1, "/twice", None) is None
+    assert [m["text"] for m in sent] == ["one", "two"]
+
+
+def test_inline_not_used_for_stateful_commands_or_open_dialog():
+    handler = bot_handler.BotHandler(
+        "token", states=bot_handler.MemoryStateStore(ttl=60, maxsize=10)
+    )
+
+    assert handler.can_reply_inline(1, "/help")
+    assert not handler.can_reply_inline(1, "/my_habits")
+
+    handler.states.set(1, {"flow": "create_habit", "step": "action"})
+    assert not handler.can_reply_inline(1, "/help")
+    assert not handler.can_reply_inline(1, "выпить воды")
+
+
+def test_dispatcher_routes_via_registry_and_middlewares(sent):
+    calls = []
+
+    def outer(chat_id, text, username, call_next):
+        calls.append(("outer", text))
+        call_next(chat_id, text, username)
+
+    def inner(chat_id, text, username, call_next):
+        calls.append(("inner", text))
+        if text != "/blocked":
+            call_next(chat_id, text, username)
+
+    handler = bot_handler.BotHandler(
+        "token",
+        states=bot_handler.MemoryStateStore(ttl=60, maxsize=10),
+        middlewares=[outer, inner],
+    )
+    assert {"/start", "/register", "/my_habits", "/create_habit", "/help"} <= set(
+        handler.commands
+    )
+
+    handler.handle_message(1, "/HELP extra", None)
+    handler.handle_message(1, "/blocked", None)
+    handler.handle_message(1, "hello", None)
+
+    assert calls == [
+        ("outer", "/HELP extra"),
+        ("inner", "/HELP extra"),
+        ("outer", "/blocked"),
+        ("inner", "/blocked"),
+        ("outer", "hello"),
+        ("inner", "hello"),
+    ]
+    assert [m["text"] for m in sent] == [
+        bot_handler.messages.HELP,
+        bot_handler.messages.UNKNOWN_COMMAND,
+    ]
+
+
+def test_webhook_enqueues_update_to_chat_queue(
+    api_client, settings, monkeypatch
+):
+    from telegram_bot import tasks
+
+    settings.TELEGRAM_BOT_TOKEN = "webhook-token"
+    settings.TELEGRAM_UPDATE_QUEUES = 4
+    enqueued = []
+    monkeypatch.setattr(
+        tasks.process_telegram_update,
+        "apply_async",
+        lambda args, queue: enqueued.append((args[0]["update_id"], queue)),
+    )
+
+    for update_id, chat_id in ((1, 10), (2, 11), (3, 14)):
+        r = api_client.post(
+            "/api/telegram/webhook/",
+            _update(chat_id, "/my_habits", update_id),
+            format="json",
+        )
+        assert r.status_code == 200
+
+    assert enqueued == [
+        (1, "telegram-updates-2"),
+        (2, "telegram-updates-3"),
+        (3, "telegram-updates-2"),
+    ]
+
+
+@pytest.mark.django_db
+def test_webhook_drops_redelivered_update(api_client, settings, monkeypatch):
+    from telegram_bot import tasks
+
+    settings.TELEGRAM_BOT_TOKEN = "webhook-token"
+    enqueued = []
+    monkeypatch.setattr(
+        tasks.process_telegram_update,
+        "apply_async",
+        lambda args, queue: enqueued.append(args[0]["update_id"]),
+    )
+
+    for update_id in (7, 7, 8, 7):
+        r = api_client.post(
+            "/api/telegram/webhook/",
+            _update(5, "/register bob secret", update_id),
+            format="json",
+        )
+        assert r.status_code == 200
+        assert r.json() == {"ok": True}
+
+    assert enqueued == [7, 8]
+
+
+@pytest.mark.django_db
+def test_webhook_accepts_redelivery_after_failed_enqueue(settings, monkeypatch):
+    from rest_framework.test import APIClient
+
+    from telegram_bot import tasks
+
+    settings.TELEGRAM_BOT_TOKEN = "webhook-token"
+    enqueued = []
+    broker_up = False
+
+    def _apply_async(args, queue):
+        if not broker_up:
+            raise ConnectionError("broker is down")
+        enqueued.append(args[0]["update_id"])
+
+    monkeypatch.setattr(tasks.process_telegram_update, "apply_async", _apply_async)
+    client = APIClient(raise_request_exception=False)
+
+    r = client.post(
+        "/api/telegram/webhook/", _update(5, "/my_habits", 9), format="json"
+    )
+    assert r.status_code == 500
+
+    broker_up = True
+    r = client.post(
+        "/api/telegram/webhook/", _update(5, "/my_habits", 9), format="json"
+    )
+    assert r.status_code == 200
+    assert enqueued == [9]
+
+
+def test_memory_deduplicator_release():
+    dedup = MemoryUpdateDeduplicator(window=4)
+
+    assert dedup.claim(10)
+    assert dedup.claim(11)
+    dedup.release(10)
+    assert dedup.claim(10)
+    assert not dedup.claim(11)
+    dedup.release(11)
+    assert dedup.claim(11)
+    # За пределами окна снимать нечего, окно не меняется.
+    dedup.release(1)
+    assert not dedup.claim(10)
+
+
+def test_memory_deduplicator_rolling_window():
+    dedup = MemoryUpdateDeduplicator(window=4)
+
+    assert dedup.claim(100)
+    assert dedup.claim(102)
+    assert not dedup.claim(100)
+    assert dedup.claim(101)
+    assert not dedup.claim(102)
+    assert dedup.claim(104)
+    assert not dedup.claim(104)
+    assert dedup.claim(103)
+    assert dedup.claim(1_000_000)
+    assert not dedup.claim(1_000_000)
+
+
+def test_memory_deduplicator_restarts_window_below_it():
+    # После недели без обновлений Telegram начинает update_id со случайного
+    # числа, которое может оказаться меньше прежних.
+    dedup = MemoryUpdateDeduplicator(window=4)
+
+    assert dedup.claim(900000001)
+    assert dedup.claim(123456)
+    assert dedup.claim(123457)
+    assert dedup.claim(123458)
+    assert not dedup.claim(123457)
@@ -11,3 +11,10 @@ class User(AbstractUser):
         unique=True,
         help_text="Chat ID пользователя в Telegram для отправки напоминаний.",
     )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Прежний chat_id нужен кешу бота (см. ``telegram_bot.signals``).
+        instance._loaded_telegram_chat_id = instance.__dict__.get("telegram_chat_id")
+        return instance